@@ -0,0 +1,75 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# markers, in the pixel space of the image they are drawn on; colors are RGB tuples
+Circle = namedtuple("Circle", ["x", "y", "radius", "color", "alpha"])  # filled, alpha in 0..1
+Box = namedtuple("Box", ["x0", "y0", "x1", "y1", "color", "width"])  # opaque outline, corners inclusive
+
+_local = threading.local()  # one scratch buffer per thread (the prefetcher renders concurrently)
+
+
+def _scratch(shape, dtype):
+    """This thread's reusable buffer of the given shape, reallocated only when the shape changes."""
+    buf = getattr(_local, "buffer", None)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = _local.buffer = np.empty(shape, dtype=dtype)
+    return buf
+
+
+def blend_circle(img, circle):
+    """Blend a filled, translucent circle into an HxWx3 uint8 array in place, touching only its bounding box."""
+    x, y, r, color, alpha = circle
+    h, w = img.shape[:2]
+    x0, x1 = max(int(np.floor(x - r)), 0), min(int(np.ceil(x + r)) + 1, w)
+    y0, y1 = max(int(np.floor(y - r)), 0), min(int(np.ceil(y + r)) + 1, h)
+    if x0 >= x1 or y0 >= y1:
+        return img
+    ys, xs = np.ogrid[y0:y1, x0:x1]
+    inside = (xs - x) ** 2 + (ys - y) ** 2 <= r * r
+    patch = img[y0:y1, x0:x1]
+    tint = np.asarray(color, dtype=np.float32) * alpha + 0.5  # + 0.5 rounds on the cast back
+    blended = (patch * np.float32(1 - alpha) + tint).astype(np.uint8)
+    np.copyto(patch, blended, where=inside[..., None])
+    return img
+
+
+def draw_box(img, box):
+    """
+    Draw an opaque rectangle outline, `width` pixels thick inside its corners, into
+    img in place. Corners may lie outside the image; only the visible part is drawn.
+    """
+    x0, y0, x1, y1 = (int(v) for v in box[:4])
+    color, t = box[4], max(int(box[5]), 1)
+    if x0 > x1 or y0 > y1:
+        return img
+
+    def fill(ya, yb, xa, xb):
+        ya, xa = max(ya, 0), max(xa, 0)  # slicing clips the upper ends, not negative starts
+        if ya < yb and xa < xb:
+            img[ya:yb, xa:xb] = color
+
+    fill(y0, min(y0 + t, y1 + 1), x0, x1 + 1)  # top
+    fill(max(y1 - t + 1, y0), y1 + 1, x0, x1 + 1)  # bottom
+    fill(y0, y1 + 1, x0, min(x0 + t, x1 + 1))  # left
+    fill(y0, y1 + 1, max(x1 - t + 1, x0), x1 + 1)  # right
+    return img
+
+
+def render(base, markers):
+    """
+    Draw markers (Circle / Box, in order) over a copy of base, an HxWx3 uint8 RGB array.
+
+    The copy goes into a per-thread buffer that is reused between calls, so the
+    result is only valid until this thread's next render: wrap it with
+    PIL.Image.fromarray (which copies) or copy it before keeping it.
+    """
+    out = _scratch(base.shape, base.dtype)
+    np.copyto(out, base)
+    for marker in markers:
+        if isinstance(marker, Circle):
+            blend_circle(out, marker)
+        else:
+            draw_box(out, marker)
+    return out
@@ -0,0 +1,211 @@
+import argparse
+import time
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+import book_memory
+from catalog import Catalog, load_catalog
+from database import WagnerFischer_semiglobal, book_database
+from labelling import LabelWriter, label_image_id, labelled_fails, read_labels
+
+AUTO_LABELLER = "auto"  # the labeller recorded for labels written here
+MIN_NEIGHBOURS = 2      # known books in the fail's nearby_window needed to judge the order
+MAX_GAP = 10            # shelf books searched beyond the neighbourhood on either side
+# alignment costs: a shelf book nobody saw is common (missed spines), a seen book that
+# doesn't belong in the stretch (a misread) much less so
+UNSEEN_COST = 1
+MISREAD_COST = 3
+MIN_MARGIN = MISREAD_COST  # the runner-up must cost at least this much more than the best candidate
+
+# an unsure fail as sent to a scoring process: plain ints and floats, no images
+Task = namedtuple("Task", ["fail_idx", "x", "candidates", "positions", "neighbours"])
+# candidates: catalog ids; positions: their shelf positions; neighbours: [(x, shelf position)]
+
+Resolution = namedtuple("Resolution", ["fail_idx", "book_id", "cost", "margin", "accepted"])
+
+
+def _single_id(book_id):
+    try:
+        return int(book_id)
+    except (TypeError, ValueError):  # a candidate list, i.e. another unsure fail
+        return None
+
+
+def unsure_tasks(bm, catalog, context=None):
+    """
+    Yields a Task per unsure fail of bm (those with a list of candidate ids) that has
+    candidates in the catalog. Neighbours are the books of its nearby_window with a
+    single id in the catalog; nearby_window indexes into context (default: bm itself).
+    """
+    context = context if context is not None else bm
+    if not len(bm):
+        return
+    fail_xs = bm.book_positions.anchors()[:, 0].tolist()
+    context_xs = context.book_positions.anchors()[:, 0].tolist() if len(context) else []
+    for idx, info in enumerate(bm.book_infos):
+        if "between_indices" in info or not isinstance(info.get("id"), (list, tuple)):
+            continue
+        candidates = [int(c) for c in info["id"] if _single_id(c) is not None and c in catalog]
+        if not candidates:
+            continue
+        neighbours = []
+        for j in info.get("nearby_window", []):
+            if j == idx or j >= len(context_xs):
+                continue
+            book_id = _single_id(context.book_infos[j]["id"])
+            if book_id is not None and book_id in catalog:
+                neighbours.append((context_xs[j], catalog.shelf_position(book_id)))
+        yield Task(idx, fail_xs[idx], candidates, [catalog.shelf_position(c) for c in candidates], neighbours)
+
+
+def score_task(task, max_gap=MAX_GAP):
+    """
+    Cost of each candidate of a task: the candidate is put among the neighbours by x, and
+    the shelf positions read left to right are aligned with WagnerFischer_semiglobal
+    against the stretch of shelf around the candidate (max_gap books beyond the
+    neighbourhood on either side). Unseen shelf books cost UNSEEN_COST and seen books
+    that are not in the stretch MISREAD_COST, so a misread neighbour is dropped rather than
+    pulling the whole window along. A candidate not itself matched, or with no neighbour
+    within reach on the shelf, costs None.
+    """
+    costs = []
+    reach = len(task.neighbours) + max_gap
+    for position in task.positions:
+        if not any(abs(p - position) <= reach for _, p in task.neighbours):
+            costs.append(None)
+            continue
+        observed = [(task.x, position)] + task.neighbours  # the candidate is observed[0]
+        order = sorted(range(len(observed)), key=observed.__getitem__)  # stable: it leads its ties
+        seq = [observed[i][1] for i in order]
+        shelf = list(range(max(position - reach, 0), position + reach + 1))
+        _, cost, _, _, changes = WagnerFischer_semiglobal(
+            seq, shelf, insertion=UNSEEN_COST, deletion=MISREAD_COST, substitution=UNSEEN_COST + MISREAD_COST)
+        # the op that consumed the candidate's element of seq ('^' ops consume only the shelf)
+        consumed = [op for op in changes if op != "^"]
+        costs.append(cost if consumed[order.index(0)] == "=" else None)
+    return costs
+
+
+def decide(task, costs, min_margin=MIN_MARGIN, min_neighbours=MIN_NEIGHBOURS):
+    """The Resolution for a scored task: accepted if the best candidate beats the runner-up by min_margin."""
+    ranked = sorted((cost, c) for c, cost in zip(task.candidates, costs) if cost is not None)
+    if not ranked:
+        return Resolution(task.fail_idx, None, None, None, False)
+    best, book_id = ranked[0]
+    margin = ranked[1][0] - best if len(ranked) > 1 else float("inf")
+    accepted = margin >= min_margin and len(task.neighbours) >= min_neighbours
+    return Resolution(task.fail_idx, book_id, best, margin, accepted)
+
+
+def _resolve_chunk(tasks, min_margin, min_neighbours, max_gap):
+    return [decide(task, score_task(task, max_gap), min_margin, min_neighbours) for task in tasks]
+
+
+class StageStats:
+    """Items and wall-clock seconds per pipeline stage, for throughput reports."""
+
+    def __init__(self):
+        self.items = {}
+        self.seconds = {}
+
+    def add(self, stage, items, seconds):
+        self.items[stage] = self.items.get(stage, 0) + items
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def report(self):
+        lines = []
+        for stage, items in self.items.items():
+            seconds = self.seconds[stage]
+            rate = items / seconds if seconds > 0 else float("inf")
+            lines.append(f"{stage:>8}: {items:8d} in {seconds:8.3f} s  ({rate:,.0f}/s)")
+        return "\n".join(lines)
+
+
+def resolve(bm, catalog, context=None, workers=1, chunksize=256, skip=(),
+            min_margin=MIN_MARGIN, min_neighbours=MIN_NEIGHBOURS, max_gap=MAX_GAP, stats=None):
+    """
+    Resolutions for every unsure fail of bm with catalog candidates, except those in skip,
+    in fail order. Fails are extracted in the calling process and scored chunksize at a
+    time; with workers > 1 the chunks are scored on a ProcessPoolExecutor while later ones
+    are still being extracted. Stage timings are added to stats (a StageStats) if given.
+    """
+    stats = stats if stats is not None else StageStats()
+    skip = set(skip)
+
+    def extract():
+        tasks = (task for task in unsure_tasks(bm, catalog, context) if task.fail_idx not in skip)
+        while True:
+            start = time.perf_counter()
+            chunk = list(islice(tasks, chunksize))
+            if not chunk:
+                return
+            stats.add("extract", len(chunk), time.perf_counter() - start)
+            yield chunk
+
+    start = time.perf_counter()
+    resolutions = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_resolve_chunk, chunk, min_margin, min_neighbours, max_gap)
+                       for chunk in extract()]
+            for future in futures:
+                resolutions.extend(future.result())
+    else:
+        for chunk in extract():
+            resolutions.extend(_resolve_chunk(chunk, min_margin, min_neighbours, max_gap))
+    # scoring overlaps extraction in the pool, so it is timed end to end
+    stats.add("score", len(resolutions), time.perf_counter() - start)
+    return resolutions
+
+
+def write_labels(bm, resolutions, labels_path, stats=None):
+    """Appends the accepted resolutions to the labels sqlite file as unsure labels by AUTO_LABELLER; returns how many."""
+    start = time.perf_counter()
+    writer = LabelWriter(labels_path, batch_size=1024)
+    accepted = [r for r in resolutions if r.accepted]
+    for r in accepted:
+        writer.write(fail_idx=r.fail_idx, image_id=label_image_id(bm, r.fail_idx), kind="unsure", book_id=r.book_id, labeller=AUTO_LABELLER)
+    writer.close()
+    if stats is not None:
+        stats.add("write", len(accepted), time.perf_counter() - start)
+    return len(accepted)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="label the unsure fails whose neighbours' shelf order already decides them, "
+                    "so only the rest reach the labelling ui")
+    parser.add_argument("--memory", default="fails.pkl", help="fails: a BookMemory pickle or save_to_dir directory")
+    parser.add_argument("--context", default=None,
+                        help="memory the fails' nearby_window indices refer to (default: the fails themselves)")
+    parser.add_argument("--catalog", default=None, help="catalog json or sqlite file (default: database.book_database)")
+    parser.add_argument("--labels", default="labels.sqlite", help="sqlite file the accepted labels are appended to")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=256)
+    parser.add_argument("--min-margin", type=int, default=MIN_MARGIN)
+    parser.add_argument("--min-neighbours", type=int, default=MIN_NEIGHBOURS)
+    parser.add_argument("--dry-run", action="store_true", help="report only, write no labels")
+    args = parser.parse_args(argv)
+
+    stats = StageStats()
+    start = time.perf_counter()
+    catalog = load_catalog(args.catalog) if args.catalog else Catalog(book_database)
+    bm = book_memory.load_from_file(args.memory, database=catalog)
+    context = book_memory.load_from_file(args.context, database=catalog) if args.context else None
+    stats.add("load", len(bm), time.perf_counter() - start)
+
+    labelled = labelled_fails(read_labels(args.labels), bm)
+    resolutions = resolve(bm, catalog, context, workers=args.workers, chunksize=args.chunksize, skip=labelled,
+                          min_margin=args.min_margin, min_neighbours=args.min_neighbours, stats=stats)
+    accepted = sum(r.accepted for r in resolutions)
+    if not args.dry_run:
+        write_labels(bm, resolutions, args.labels, stats)
+
+    print(stats.report())
+    print(f"{accepted} of {len(resolutions)} unsure fails resolved automatically, "
+          f"{len(resolutions) - accepted} left for review")
+
+
+if __name__ == "__main__":
+    main()
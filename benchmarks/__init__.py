@@ -0,0 +1 @@
+"""Standalone bench_*.py scripts, their shared generators, and the regression suite (python -m benchmarks.suite)."""
@@ -0,0 +1,78 @@
+"""
+Annotating a photo: the PIL overlay + alpha_composite helpers vs. annotate.render.
+
+Draws one unsure-fail circle, one skip box, and --markers circles at once (e.g.
+every unsure fail on a photo) on a random --width x --height RGB frame.
+
+    python benchmarks/bench_annotate.py --width 1280 --height 960
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from annotate import Box, Circle, render
+
+
+def pil_circles(img, points, radius=30, color=(0, 255, 0, 64)):
+    """The PIL compositing book_matcher used before annotate.render, generalised to several points on one overlay."""
+    img = img.convert("RGBA")
+    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for x, y in points:
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    return Image.alpha_composite(img, overlay)
+
+
+def pil_box(img, left_x, right_x, outline_color=(255, 0, 0), outline_width=10):
+    """The PIL skip box book_matcher drew before annotate.render."""
+    base = img.convert("RGBA")
+    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).rectangle(
+        [(left_x, 0), (right_x, base.size[1])], outline=outline_color + (255,), width=outline_width)
+    return Image.alpha_composite(base, overlay)
+
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--markers", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rgb = rng.integers(0, 255, size=(args.height, args.width, 3), dtype=np.uint8)
+    pil = Image.fromarray(rgb)
+    points = [(float(x), float(y)) for x, y in rng.uniform((0, 0), (args.width, args.height), (args.markers, 2))]
+    green, alpha = (0, 255, 0), 64 / 255
+
+    cases = [
+        ("1 circle",
+         lambda: pil_circles(pil, points[:1]),
+         lambda: Image.fromarray(render(rgb, [Circle(*points[0], 30, green, alpha)]))),
+        ("skip box",
+         lambda: pil_box(pil, 200, 400),
+         lambda: Image.fromarray(render(rgb, [Box(200, 0, 400, args.height, (255, 0, 0), 10)]))),
+        (f"{args.markers} circles",
+         lambda: pil_circles(pil, points),
+         lambda: Image.fromarray(render(rgb, [Circle(x, y, 30, green, alpha) for x, y in points]))),
+    ]
+    print(f"{args.width}x{args.height}, best of {args.repeat}")
+    for name, old, new in cases:
+        old_ms, new_ms = best_ms(old, args.repeat), best_ms(new, args.repeat)
+        print(f"{name:12s} PIL composite {old_ms:7.2f} ms   annotate.render {new_ms:7.2f} ms   x{old_ms / new_ms:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
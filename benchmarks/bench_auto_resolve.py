@@ -0,0 +1,85 @@
+"""
+Throughput and precision of auto_resolve.py on a synthetic shelf scan.
+
+Builds a synthetic catalog and a scan of it (a BookMemory of recognised books in
+shelf order, with some spines missed), then --fails unsure fails among them, each
+with the true id, a random distractor and, for a --near fraction, a book shelved a
+few places away as candidates; some neighbours are misread as other books. Resolves them with 1 and --workers processes and
+reports per-stage throughput, how many were accepted and how many of those were right.
+
+    python benchmarks/bench_auto_resolve.py --fails 20000 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from auto_resolve import StageStats, resolve
+from benchmarks.generators import synthetic_catalog
+from book_memory import BookMemory
+from catalog import Catalog
+
+
+def synthetic_scan(catalog, n_fails, rng, window=4, missed=0.1, misread=0.05, near=0.3):
+    """(context, fails, truth): the recognised books, unsure fails whose nearby_window points into context, and fail -> true id."""
+    ids = catalog.ids
+    context = BookMemory(database=None)
+    fails = BookMemory(database=None)
+    truth = {}
+    per_stretch = 20  # shelf books per scanned stretch, one fail among them
+    # disjoint stretches, since BookMemory merges books by id
+    slots = list(range(len(ids) // per_stretch))
+    rng.shuffle(slots)
+    spare = iter(ids[slot * per_stretch + i] for slot in slots[n_fails:] for i in range(per_stretch))
+    for slot in slots[:n_fails]:
+        start = slot * per_stretch
+        stretch = ids[start:start + per_stretch]
+        target = rng.randrange(window, per_stretch - window)
+        seen = []  # context indices of this stretch, by shelf order
+        for i, book_id in enumerate(stretch):
+            if i != target and rng.random() >= missed:
+                if rng.random() < misread:
+                    book_id = next(spare)  # a book from elsewhere on the shelf, used once
+                seen.append((i, context.add_book(np.array([(start + i) * 0.03, 0.0, 0.0]), {"id": book_id})))
+        nearby = [j for i, j in seen if abs(i - target) <= window]
+        true_id = stretch[target]
+        candidates = [None, true_id, ids[rng.randrange(len(ids))]]
+        if rng.random() < near:
+            candidates.append(ids[start + target + rng.choice([-3, -2, 2, 3])])
+        rng.shuffle(candidates)
+        fails.window = nearby + [None]  # add_book keeps window[:-1] as the nearby_window
+        idx = fails.add_book(np.array([(start + target) * 0.03, 0.0, 0.0]), {"id": candidates, "fail": len(truth)})
+        truth[idx] = true_id
+    return context, fails, truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=500_000, help="more than 20 books per fail")
+    parser.add_argument("--fails", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--near", type=float, default=0.3, help="fraction of fails with a nearby-shelved distractor")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = Catalog(synthetic_catalog(args.catalog_size, rng))
+    context, fails, truth = synthetic_scan(catalog, args.fails, rng, near=args.near)
+
+    for workers in sorted({1, args.workers}):
+        stats = StageStats()
+        resolutions = resolve(fails, catalog, context, workers=workers, stats=stats)
+        accepted = [r for r in resolutions if r.accepted]
+        correct = sum(r.book_id == truth[r.fail_idx] for r in accepted)
+        print(f"workers={workers}")
+        print(stats.report())
+        print(f"accepted {len(accepted)} / {len(resolutions)} ({len(accepted) / len(resolutions):.0%}), "
+              f"{correct / max(len(accepted), 1):.2%} of them correct\n")
+
+
+if __name__ == "__main__":
+    main()
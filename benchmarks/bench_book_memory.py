@@ -0,0 +1,83 @@
+"""
+BookMemory.add_book throughput as a memory grows over a long shelf sweep.
+
+Every run adds --sizes books with distinct ids (a tenth of them fails with a
+list of candidate ids) and then re-adds a sample of them, which takes the
+update path. The old linear id scan is timed alongside at the sizes where it
+finishes in reasonable time (--linear-max).
+
+    python benchmarks/bench_book_memory.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from book_memory import BookMemory
+
+
+class LinearScanMemory(BookMemory):
+    """add_book as it was before the id index: scan every stored info."""
+
+    def add_book(self, position, info, img_info=None):
+        for i, book in enumerate(self.book_infos):
+            if book['id'] == info['id']:
+                self.book_positions[i] = position
+                self.book_infos[i].update(info)
+                self._recent_indices.append(i)
+                return i
+        self.book_positions.append(position)
+        info["nearby_window"] = self.window[:-1]
+        self.book_infos.append(info)
+        self._recent_indices.append(len(self.book_positions) - 1)
+        return len(self.book_positions) - 1
+
+
+def detections(n, rng):
+    out = []
+    for i in range(n):
+        book_id = [None, i] if rng.random() < 0.1 else i
+        out.append((np.array([i * 0.03, 0.0, 1.0]), {"id": book_id, "similarity": None}))
+    return out
+
+
+def run(memory_cls, n, rng, updates=1000):
+    books = detections(n, rng)
+    again = [(pos, dict(info)) for pos, info in rng.sample(books, min(updates, n))]
+    bm = memory_cls(database=None)
+    start = time.perf_counter()
+    for pos, info in books:
+        bm.add_book(pos, info)
+    add_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for pos, info in again:
+        bm.add_book(pos, info)
+    update_s = time.perf_counter() - start
+    assert len(bm) == n
+    return n / add_s, len(again) / update_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--linear-max", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'books':>10s} {'impl':>8s} {'adds/s':>14s} {'updates/s':>14s}")
+    for n in args.sizes:
+        impls = [("indexed", BookMemory)]
+        if n <= args.linear_max:
+            impls.append(("linear", LinearScanMemory))
+        for name, cls in impls:
+            adds, updates = run(cls, n, random.Random(args.seed))
+            print(f"{n:>10,d} {name:>8s} {adds:>14,.0f} {updates:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
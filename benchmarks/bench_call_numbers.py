@@ -0,0 +1,80 @@
+"""
+Call-number parsing and lookup throughput over a full catalog.
+
+Uses --catalog (a JSON file shaped like subset_book_database.json) if given,
+otherwise a synthetic catalog of --size LC call numbers. Compares packed keys
+against re-normalizing call number strings on every comparison/lookup.
+
+    python benchmarks/bench_call_numbers.py --size 500000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from functools import cmp_to_key
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.generators import synthetic_call_number
+from call_numbers import call_number_key, normalize_call_number, parse_call_number
+from catalog import Catalog
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:38s} {elapsed * 1e3:9.1f} ms  {n / elapsed:12,.0f} /s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", help="JSON catalog to use instead of a synthetic one")
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.catalog:
+        with open(args.catalog, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        records = {str(i): {"call_number": synthetic_call_number(rng), "alt_title": ""} for i in range(args.size)}
+    call_numbers = [rec["call_number"] for rec in records.values()]
+    n = len(call_numbers)
+    print(f"{n:,} call numbers")
+
+    timed("parse_call_number", n, lambda: [parse_call_number(cn) for cn in call_numbers])
+    call_number_key.cache_clear()
+    keys = timed("call_number_key (cold cache)", n, lambda: [call_number_key(cn) for cn in call_numbers])
+    timed("call_number_key (warm cache)", n, lambda: [call_number_key(cn) for cn in call_numbers])
+    call_number_key.cache_clear()
+    catalog = timed("Catalog build (parse + sort + index)", n, lambda: Catalog(records))
+    print(f"{'mean packed key size':38s} {sum(map(len, keys)) / n:9.1f} bytes")
+
+    timed("sort on cached packed keys", n, lambda: sorted(keys))
+    sample = rng.sample(call_numbers, min(n, 20_000))
+    timed("sort re-parsing on every comparison", len(sample),
+          lambda: sorted(sample, key=cmp_to_key(lambda a, b: (call_number_key.__wrapped__(a) > call_number_key.__wrapped__(b))
+                                                - (call_number_key.__wrapped__(a) < call_number_key.__wrapped__(b)))))
+
+    queries = [rng.choice(call_numbers) for _ in range(args.lookups)]
+    timed("catalog.locate (bisect)", len(queries), lambda: [catalog.locate(q) for q in queries])
+    timed("catalog.id_for_call_number (hash)", len(queries), lambda: [catalog.id_for_call_number(q) for q in queries])
+    linear = queries[:200]
+    timed("linear scan re-normalizing strings", len(linear),
+          lambda: [next(i for i, cn in enumerate(call_numbers) if normalize_call_number(cn) == normalize_call_number(q))
+                   for q in linear])
+    timed("catalog.shelf_codes", len(queries), lambda: catalog.shelf_codes(queries))
+    sorted_keys = catalog._keys
+    timed("bisect on packed keys only", len(queries),
+          lambda: [bisect_left(sorted_keys, call_number_key(q)) for q in queries])
+
+
+if __name__ == "__main__":
+    main()
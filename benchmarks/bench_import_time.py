@@ -0,0 +1,62 @@
+"""
+Cold import time of the project modules, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter; the report shows its cumulative
+import time and the slowest top-level dependencies it pulled in. With
+--target-ms the script exits non-zero if any module takes longer than that.
+
+    python benchmarks/bench_import_time.py --target-ms 300
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODULES = ["call_numbers", "catalog", "database", "book_memory", "book_matcher"]
+
+
+def import_times(statement):
+    """{package: cumulative µs} for the top two levels of imports `statement` runs, in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package", nesting shown by indentation
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("     "):  # nested deeper than a direct dependency
+            continue
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--top", type=int, default=5, help="slowest dependencies to list per module")
+    parser.add_argument("--target-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    startup = set(import_times("pass"))  # imported by the interpreter itself, not by our modules
+    over = []
+    for module in args.modules:
+        times = import_times(f"import {module}")
+        total_ms = times[module] / 1e3
+        print(f"{module:14s} {total_ms:8.1f} ms")
+        deps = sorted((t, name) for name, t in times.items() if name != module and name not in startup)[::-1]
+        for t, name in deps[:args.top]:
+            print(f"    {name:30s} {t / 1e3:8.1f} ms")
+        if args.target_ms is not None and total_ms > args.target_ms:
+            over.append(module)
+
+    if over:
+        print(f"over {args.target_ms:g} ms: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-book alignment latency over a simulated sweep: realigning from scratch vs IncrementalAligner.
+
+A sweep reads --books spines left to right from a stretch of shelf (catalog ids in
+call-number order, with misread and missed spines). After every book the observed
+sequence is aligned semi-globally against the --catalog-size shelf, both over the
+whole sweep so far (growing) and over the last --window books (sliding, as
+BookMemory.window does), from scratch with WagnerFischer_semiglobal and with
+IncrementalAligner (scratch includes the traceback WagnerFischer_semiglobal always
+does; cost() skips it). Costs are checked to agree; latencies are reported early and
+late in the sweep.
+
+    python benchmarks/bench_incremental_align.py --books 300 --window 12
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import IncrementalAligner, WagnerFischer_semiglobal
+
+
+def sweep(shelf, books, rng, misread=0.05, missed=0.1):
+    offset = rng.randrange(len(shelf) - 2 * books)
+    observed = []
+    for book_id in shelf[offset:offset + 2 * books]:
+        if len(observed) == books:
+            break
+        if rng.random() < missed:
+            continue
+        observed.append(rng.choice(shelf) if rng.random() < misread else book_id)
+    return observed
+
+
+def timed_run(observed, shelf, window, scratch):
+    """Seconds per book and the cost after each, for one way of aligning."""
+    aligner = None if scratch else IncrementalAligner(shelf)
+    seconds, costs = [], []
+    for i in range(len(observed)):
+        current = observed[max(0, i + 1 - window):i + 1] if window else observed[:i + 1]
+        start = time.perf_counter()
+        if scratch:
+            cost = WagnerFischer_semiglobal(current, shelf)[1]
+        else:
+            aligner.sync(current)
+            cost = aligner.cost()
+        seconds.append(time.perf_counter() - start)
+        costs.append(cost)
+    return np.array(seconds), costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=20_000)
+    parser.add_argument("--books", type=int, default=300)
+    parser.add_argument("--window", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shelf = list(range(args.catalog_size))
+    rng.shuffle(shelf)  # database ids in call-number order
+    observed = sweep(shelf, args.books, rng)
+    tenth = max(len(observed) // 10, 1)
+
+    for label, window in (("growing", None), (f"sliding (window {args.window})", args.window)):
+        print(label)
+        results = {name: timed_run(observed, shelf, window, scratch) for name, scratch in
+                   (("scratch", True), ("incremental", False))}
+        assert results["scratch"][1] == results["incremental"][1], "costs differ"
+        for name, (seconds, _) in results.items():
+            print(f"  {name:>11}: first 10% {seconds[:tenth].mean() * 1e3:7.2f} ms/book  "
+                  f"last 10% {seconds[-tenth:].mean() * 1e3:7.2f} ms/book  total {seconds.sum():6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Load test: many labellers working through one fail session at the same time.
+
+Builds a synthetic session (--photos photos with unsure and skipped fails), then
+runs --labellers threads that drive the book_matcher callbacks directly, each as
+its own gradio session: pick a candidate for unsure fails, answer No or Yes +
+click for skipped ones, until the work queue is empty. Checks that every fail
+was labelled exactly once and every photo by a single labeller, and reports
+throughput, per-click latency and where it goes (book_matcher.metrics spans).
+
+    python benchmarks/bench_labelling.py --labellers 20 --photos 200
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import book_matcher
+from benchmarks.generators import synthetic_session
+from book_memory import save_to_dir
+from labelling import read_labels
+from metrics import Metrics
+
+
+def label_until_done(name, seed):
+    """One labeller: answers whatever it is shown until the work queue runs dry. Returns fails answered."""
+    rng = random.Random(seed)
+    request = SimpleNamespace(session_hash=name)
+    out = book_matcher.next_entry(book_matcher.init_state, request)
+    state, current = out[9], out[10]
+    answered = 0
+    while current is not None:
+        if "between_indices" not in book_matcher.bm.book_infos[current]:  # unsure: pick a candidate
+            options = book_matcher.build_radio_options(book_matcher.bm.book_infos[current]["id"])
+            choice = rng.choice([value for _, value in options if value != book_matcher.MANUAL])
+            out = book_matcher.on_next(choice, None, state, current, request)
+            state, current = out[9], out[10]
+        elif rng.random() < 0.5:  # skipped, not in the masked area
+            out = book_matcher.on_found_radio("No", state, current, request)
+            state, current = out[6], out[7]
+        else:  # skipped and found: click on it
+            image = book_matcher.on_found_radio("Yes", state, current, request)[2]["value"]
+            evt = SimpleNamespace(index=(rng.randrange(image.width), rng.randrange(image.height)))
+            out = book_matcher.on_click_book(evt, image, state, current, request)
+            state, current = out[8], out[10]
+        answered += 1
+    return answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labellers", type=int, default=20)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--unsure", type=int, default=2, help="unsure fails per photo")
+    parser.add_argument("--skipped", type=int, default=3, help="skipped fails per photo")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        bm = synthetic_session(args.photos, args.unsure, args.skipped, np.random.default_rng(args.seed),
+                               n_books=len(book_matcher.book_database))
+        save_to_dir(bm, os.path.join(tmp, "fails.bm"))
+        labels_path = os.path.join(tmp, "labels.sqlite")
+        book_matcher.load_session(os.path.join(tmp, "fails.bm"), labels_path=labels_path)
+        book_matcher.metrics = Metrics(window=1_000_000)
+        book_matcher.gr.update()  # import gradio before the clock starts
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.labellers) as pool:
+            answered = list(pool.map(label_until_done, [f"labeller{i}" for i in range(args.labellers)],
+                                     range(args.labellers)))
+        book_matcher.label_writer.flush()
+        elapsed = time.perf_counter() - start
+
+        labels = read_labels(labels_path)
+        per_fail = defaultdict(int)
+        per_image = defaultdict(set)
+        for label in labels:
+            per_fail[label["fail_idx"]] += 1
+            per_image[label["image_id"]].add(label["labeller"])
+        assert len(per_fail) == len(bm) and max(per_fail.values()) == 1, "fails missing or labelled twice"
+        assert all(len(who) == 1 for who in per_image.values()), "a photo was shared between labellers"
+
+        print(f"{args.labellers} labellers, {len(bm)} fails on {args.photos} photos: {elapsed:.2f} s, "
+              f"{len(labels) / elapsed:.0f} labels/s")
+        print(f"answered per labeller: min {min(answered)} max {max(answered)}; "
+              f"new_bm has {len(book_matcher.new_bm)} books")
+        for name, span in sorted(book_matcher.metrics.spans.items()):
+            latency = span.recent
+            print(f"{name:>14}: n={span.count:6d}  p50 {latency.percentile(50) * 1e3:7.2f} ms  "
+                  f"p95 {latency.percentile(95) * 1e3:7.2f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Peak memory and time of WagnerFischer vs WagnerFischer_linear on long shelf runs.
+
+For each --sizes n, a run of n books is read off a shelf (catalog ids in call-number
+order, with misread and missed spines) and aligned against the n-book catalog stretch
+it came from. Peak memory is measured with tracemalloc (numpy buffers included). The
+pure-Python matrix the alignment used to build is timed too up to --python-max.
+
+    python benchmarks/bench_linear_align.py --sizes 1000 2000 4000 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import WagnerFischer, WagnerFischer_linear, _wagner_fischer_python
+
+
+def shelf_run(n, rng, misread=0.05, missed=0.05):
+    shelf = list(range(n))
+    run = [rng.randrange(10 * n) if rng.random() < misread else book_id
+           for book_id in shelf if rng.random() >= missed]
+    return run, shelf
+
+
+def measure(align, *args, **kwargs):
+    """(result, seconds, peak MB) of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = align(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000])
+    parser.add_argument("--python-max", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=0, help="also time parallel=True with this many processes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for n in args.sizes:
+        run, shelf = shelf_run(n, rng)
+        print(f"n={len(run)} m={len(shelf)}")
+        expected, seconds, peak = measure(WagnerFischer, run, shelf)
+        print(f"  {'WagnerFischer':>22}: {seconds:7.2f} s  {peak:8.1f} MB")
+        if n <= args.python_max:
+            result, seconds, peak = measure(_wagner_fischer_python, run, shelf)
+            assert result == expected
+            print(f"  {'python matrix':>22}: {seconds:7.2f} s  {peak:8.1f} MB")
+        result, seconds, peak = measure(WagnerFischer_linear, run, shelf)
+        assert result == expected, "linear-space alignment differs"
+        print(f"  {'WagnerFischer_linear':>22}: {seconds:7.2f} s  {peak:8.1f} MB  (identical)")
+        if args.workers:
+            # tracemalloc only sees this process, so the workers' memory is not counted
+            result, seconds, _ = measure(WagnerFischer_linear, run, shelf, parallel=True, max_workers=args.workers)
+            same = "identical" if result == expected else "same cost" if \
+                result[2].count("=") == expected[2].count("=") and len(result[2]) == len(expected[2]) else "DIFFERENT"
+            print(f"  {'linear, ' + str(args.workers) + ' workers':>22}: {seconds:7.2f} s  ({same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Loading a BookMemory session: pickle vs. the save_to_dir format.
+
+Builds a synthetic fail session (--photos full-resolution BGR frames shared by
+--fails-per-photo fails each), writes it both ways and times loading it and
+then touching a single image.
+
+    python benchmarks/bench_memory_io.py --photos 200
+"""
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from book_memory import BookMemory, load_from_file, save_to_dir
+
+
+def synthetic_session(photos, fails_per_photo, rng):
+    bm = BookMemory(database=None)
+    for p in range(photos):
+        image = rng.integers(0, 255, size=(960, 1280, 3), dtype=np.uint8)
+        for f in range(fails_per_photo):
+            book_id = p * fails_per_photo + f
+            x = rng.integers(0, 1200)
+            bm.add_book([np.array([x, 480]), np.array([x + 80, 480])],
+                        {"id": book_id, "similarity": None, "between_indices": [book_id - 1, book_id + 1]},
+                        {"image": image, "cam_extr": None})
+    return bm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--fails-per-photo", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bm = synthetic_session(args.photos, args.fails_per_photo, np.random.default_rng(args.seed))
+    tmp = tempfile.mkdtemp()
+    try:
+        pkl = os.path.join(tmp, "fails.pkl")
+        bmdir = os.path.join(tmp, "fails.bm")
+        with open(pkl, "wb") as f:
+            pickle.dump(bm, f)
+        save_to_dir(bm, bmdir)
+        size = sum(os.path.getsize(os.path.join(bmdir, name)) for name in os.listdir(bmdir))
+        print(f"{len(bm)} fails on {args.photos} photos: pickle {os.path.getsize(pkl) / 1e6:.0f} MB, "
+              f"dir {size / 1e6:.0f} MB")
+
+        for name, path in (("pickle", pkl), ("save_to_dir", bmdir)):
+            start = time.perf_counter()
+            loaded = load_from_file(path)
+            load_s = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded.book_img_info[len(loaded) // 2]["image"].sum()
+            touch_s = time.perf_counter() - start
+            print(f"{name:12s} load {load_s * 1e3:9.1f} ms   first image touch {touch_s * 1e3:7.1f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
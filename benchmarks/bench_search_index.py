@@ -0,0 +1,74 @@
+"""
+Fuzzy catalog lookup with search_index.NgramIndex.
+
+Builds (or loads, with --index PATH) the n-gram index over a synthetic catalog of
+--size records with LC call numbers and CJK titles, then times top-k queries for
+records whose call number or title has been hit by --typos random edits, as
+noisy OCR output would be, and reports how often the true record ranks first.
+
+    python benchmarks/bench_search_index.py --size 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.generators import HANZI, synthetic_catalog
+from catalog import Catalog
+from search_index import NgramIndex
+
+def add_typos(text, typos, rng, alphabet):
+    chars = list(text)
+    for _ in range(typos):
+        op, pos = rng.randrange(3), rng.randrange(max(len(chars), 1))
+        if op == 0 and chars:
+            chars[pos] = rng.choice(alphabet)
+        elif op == 1 and chars:
+            del chars[pos]
+        else:
+            chars.insert(pos, rng.choice(alphabet))
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--typos", type=int, default=2)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", default=None, help="load the index from / save it to this .npz")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = Catalog(synthetic_catalog(args.size, rng))
+
+    start = time.perf_counter()
+    index = NgramIndex.load_or_build(args.index, catalog) if args.index else NgramIndex.build(catalog)
+    print(f"index over {len(index)} fields, {len(index.vocab)} grams: {time.perf_counter() - start:.1f} s")
+
+    latencies, found = [], 0
+    for _ in range(args.queries):
+        db_id = rng.randrange(args.size)
+        rec = catalog[db_id]
+        if rng.random() < 0.5:
+            query = add_typos(rec["call_number"].strip(), args.typos, rng, "0123456789ABCDEFGHKLMPRSTWZ. ")
+        else:
+            query = add_typos(rec["alt_title"], args.typos, rng, HANZI)
+        start = time.perf_counter()
+        hits = index.search(query, k=args.k)
+        latencies.append(time.perf_counter() - start)
+        found += bool(hits) and hits[0][0] == db_id
+
+    ms = np.array(latencies) * 1e3
+    print(f"{args.queries} queries with {args.typos} typos: p50 {np.percentile(ms, 50):.2f} ms  "
+          f"p95 {np.percentile(ms, 95):.2f} ms  top-1 {found / args.queries:.1%}")
+
+
+if __name__ == "__main__":
+    main()
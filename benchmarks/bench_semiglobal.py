@@ -0,0 +1,63 @@
+"""
+Semi-global alignment vs. the windowed approach on a synthetic catalog.
+
+The windowed approach guesses every window of the catalog (call-number order) with
+the scan's length and aligns each with WagnerFischer; only a sample of windows is
+timed and the total is extrapolated, since the full sweep takes minutes.
+
+    python benchmarks/bench_semiglobal.py --catalog-size 100000 --scan-length 40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import WagnerFischer, WagnerFischer_distance, WagnerFischer_semiglobal
+
+
+def synthetic_scan(catalog_order, scan_length, rng, misreads=3, drops=1):
+    """A run of shelved books at a random offset, with misread and undetected spines."""
+    offset = rng.randrange(len(catalog_order) - scan_length)
+    scan = list(catalog_order[offset:offset + scan_length])
+    for _ in range(misreads):
+        scan[rng.randrange(len(scan))] = rng.randrange(len(catalog_order))
+    for _ in range(drops):
+        del scan[rng.randrange(len(scan))]
+    return offset, scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=100_000)
+    parser.add_argument("--scan-length", type=int, default=40)
+    parser.add_argument("--windows-sampled", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog_order = list(range(args.catalog_size))
+    rng.shuffle(catalog_order)  # database ids in call-number order
+    true_offset, scan = synthetic_scan(catalog_order, args.scan_length, rng)
+    n_windows = args.catalog_size - args.scan_length + 1
+
+    start = time.perf_counter()
+    offset, cost, _, _, changes = WagnerFischer_semiglobal(scan, catalog_order)
+    semiglobal_s = time.perf_counter() - start
+    print(f"semi-global:      {semiglobal_s * 1e3:9.1f} ms  offset={offset} (true {true_offset}) cost={cost} {changes}")
+
+    sampled = rng.sample(range(n_windows), min(args.windows_sampled, n_windows))
+    for name, align in (("WagnerFischer", WagnerFischer), ("distance only", WagnerFischer_distance)):
+        start = time.perf_counter()
+        for s in sampled:
+            align(scan, catalog_order[s:s + args.scan_length])
+        per_window = (time.perf_counter() - start) / len(sampled)
+        total = per_window * n_windows
+        print(f"windowed {name + ':':15s} {total * 1e3:9.1f} ms  (extrapolated from {len(sampled)} of "
+              f"{n_windows} windows, {total / semiglobal_s:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
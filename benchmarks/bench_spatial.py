@@ -0,0 +1,83 @@
+"""
+BookMemory.query_range / query_nearest against linear passes over book_positions.
+
+Books are spread along a 20 m shelf. "python loop" is the per-book pass callers
+did before; "numpy scan" stacks every position and filters on each query.
+The sweep workload interleaves one add_book with one query, which exercises the
+pending set and lazy rebuilds.
+
+    python benchmarks/bench_spatial.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from book_memory import BookMemory
+
+
+def per_query(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(*q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def linear_range(bm, x0, x1):
+    return [i for i, p in enumerate(bm.book_positions) if x0 <= p[0] <= x1]
+
+
+def linear_nearest(bm, point, k):
+    d = [np.linalg.norm(p - point) for p in bm.book_positions]
+    return sorted(range(len(d)), key=d.__getitem__)[:k]
+
+
+def numpy_range(bm, x0, x1):
+    xs = np.array(list(bm.book_positions))[:, 0]
+    return np.flatnonzero((xs >= x0) & (xs <= x1))
+
+
+def numpy_nearest(bm, point, k):
+    d = np.linalg.norm(np.array(list(bm.book_positions)) - point, axis=1)
+    return np.argsort(d)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'books':>9s} {'query':>8s} {'python loop':>13s} {'numpy scan':>12s} {'indexed':>10s}   (us/query)")
+    for n in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        bm = BookMemory(database=None)
+        for i, p in enumerate(rng.random((n, 3)) * [20.0, 0.3, 2.0]):
+            bm.add_book(p, {"id": i})
+
+        ranges = [(x0, x0 + 0.5) for x0 in rng.random(args.queries) * 20]
+        points = [(p, args.k) for p in rng.random((args.queries, 3)) * [20.0, 0.3, 2.0]]
+        few = max(1, min(args.queries, 200_000 // n))  # the pure-Python pass is slow
+        bm.query_range(0, 0)  # first build
+        print(f"{n:>9,d} {'range':>8s} {per_query(lambda *q: linear_range(bm, *q), ranges[:few]):13.1f} "
+              f"{per_query(lambda *q: numpy_range(bm, *q), ranges[:few]):12.1f} {per_query(bm.query_range, ranges):10.1f}")
+        print(f"{n:>9,d} {'nearest':>8s} {per_query(lambda *q: linear_nearest(bm, *q), points[:few]):13.1f} "
+              f"{per_query(lambda *q: numpy_nearest(bm, *q), points[:few]):12.1f} {per_query(bm.query_nearest, points):10.1f}")
+
+        sweep = rng.random((args.queries * 10, 3)) * [20.0, 0.3, 2.0]
+        start = time.perf_counter()
+        for j, p in enumerate(sweep):
+            bm.add_book(p, {"id": n + j})
+            bm.query_range(p[0] - 0.25, p[0] + 0.25)
+        print(f"{n:>9,d} {'sweep':>8s} {'':13s} {'':12s} {(time.perf_counter() - start) / len(sweep) * 1e6:10.1f}"
+              "   (add + range query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Seeded synthetic data for the benchmarks: catalogs shaped like database.book_database
+and BookMemory fail sessions with photos, positions, unsure and skipped fails.
+Every generator draws only from the rng it is given, so a seed reproduces the data.
+"""
+import numpy as np
+
+from book_memory import BookMemory
+
+# common characters of Chinese book titles
+HANZI = "广东省志历史文化地理研究论文集中国乡土教材市县概况南新探究全书百科人物辞典记大学出版社年鉴经济社会民族语言艺术"
+
+
+def synthetic_call_number(rng):
+    """A plausible LC call number with the spacing/suffix noise seen in book_database."""
+    letters = rng.choice(["DS", "DT", "F", "PL", "Q", "QA", "TK", "ML", "PS", "RC", "GT", "TX", "CT"])
+    number = str(rng.randrange(1, 9999))
+    if rng.random() < 0.3:
+        number += "." + str(rng.randrange(1, 999))
+    cutters = [f"{rng.choice('ABCDEFGHKLMPRSTWZ')}{rng.randrange(1, 99999)}" for _ in range(rng.randrange(1, 3))]
+    cn = letters + rng.choice(["", " "]) + number + rng.choice([".", " ."]) + " ".join(cutters)
+    if rng.random() < 0.8:
+        cn += " " + str(rng.randrange(1950, 2025))
+    if rng.random() < 0.1:
+        cn += f", V.{rng.randrange(1, 20)}"
+    return cn + " " * rng.randrange(0, 4)
+
+
+def synthetic_title(rng):
+    return "".join(rng.choice(HANZI) for _ in range(rng.randrange(4, 16)))
+
+
+def synthetic_catalog(size, rng):
+    """{"0": {"call_number", "alt_title", "lang"}, ...} like book_database, from a random.Random."""
+    return {str(i): {"call_number": synthetic_call_number(rng), "alt_title": synthetic_title(rng), "lang": "CHN"}
+            for i in range(size)}
+
+
+def synthetic_session(photos, unsure, skipped, rng, n_books, shape=(480, 640, 3)):
+    """
+    A BookMemory of fails from a numpy Generator: per photo `unsure` unsure fails (candidates
+    drawn from ids below n_books) and `skipped` skipped ones, all with distinct ids from
+    n_books on, since BookMemory merges books by id.
+    """
+    bm = BookMemory(database=None)
+    fail_ids = iter(range(n_books, n_books + photos * (unsure + skipped)))
+    for p in range(photos):
+        image = rng.integers(0, 255, size=shape, dtype=np.uint8)
+        for _ in range(unsure):
+            x, y = rng.uniform(0, shape[1]), rng.uniform(0, shape[0])
+            candidates = [None] + rng.choice(n_books, size=2, replace=False).tolist() + [next(fail_ids)]
+            bm.add_book(np.array([x, y]), {"id": candidates, "similarity": [None, 0.5, 0.4]}, {"image": image})
+        for s in range(skipped):
+            gap = shape[1] / 8
+            left = rng.uniform(0, shape[1] - gap)
+            bm.add_book([np.array([left, shape[0] / 2]), np.array([left + gap, shape[0] / 2])],
+                        {"id": next(fail_ids), "between_indices": [p, s, s + 1], "similarity": None},
+                        {"image": image})
+    return bm
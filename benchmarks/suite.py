@@ -0,0 +1,294 @@
+"""
+The benchmark suite: times the core operations on seeded synthetic data, saves the
+results as JSON, and compares two result files to catch regressions.
+
+    python -m benchmarks.suite run --out before.json
+    ... change something ...
+    python -m benchmarks.suite run --out after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 0.1
+
+compare exits with status 1 if any case's median time grew by more than the threshold
+(a fraction), so it can gate a CI job. --scale shrinks or grows every case's data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import book_matcher
+from annotate import render
+from benchmarks.generators import synthetic_catalog, synthetic_session
+from book_memory import BookMemory, save_to_dir
+from catalog import Catalog
+from database import WagnerFischer
+from labelling import START, WorkQueue
+
+FORMAT_VERSION = 1
+
+# name -> setup(scale, seed, tmp) returning (run, n): run() is what gets timed, n the
+# number of operations it performs (for per-op times)
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _n(base, scale):
+    return max(1, int(base * scale))
+
+
+def _shelf_books(n, rng):
+    """A BookMemory of n recognised books along a shelf, x increasing with jitter."""
+    bm = BookMemory(database=None)
+    for i in range(n):
+        bm.add_book(np.array([i * 0.03 + rng.uniform(-0.01, 0.01), 0.0, 1.0]), {"id": i, "similarity": 0.9})
+    return bm
+
+
+@case("wagner_fischer")
+def wagner_fischer(scale, seed, tmp):
+    rng = random.Random(seed)
+    shelf = list(range(_n(400, scale)))
+    scan = [rng.randrange(10 * len(shelf)) if rng.random() < 0.05 else b for b in shelf if rng.random() >= 0.05]
+    return (lambda: WagnerFischer(scan, shelf)), 1
+
+
+@case("catalog_build")
+def catalog_build(scale, seed, tmp):
+    records = synthetic_catalog(_n(20_000, scale), random.Random(seed))
+    return (lambda: Catalog(records)), len(records)
+
+
+@case("add_book")
+def add_book(scale, seed, tmp):
+    rng = random.Random(seed)
+    n = _n(20_000, scale)
+    positions = [np.array([i * 0.03, rng.uniform(0, 2), 1.0]) for i in range(n)]
+
+    def run():
+        bm = BookMemory(database=None)  # one memory growing to n books, so the id index is exercised
+        for i, p in enumerate(positions):
+            bm.add_book(p, {"id": i})
+    return run, n
+
+
+@case("get_book")
+def get_book(scale, seed, tmp):
+    rng = random.Random(seed)
+    bm = _shelf_books(_n(20_000, scale), rng)
+    singles = [rng.randrange(len(bm)) for _ in range(10_000)]
+    lists = [rng.sample(range(len(bm)), 10) for _ in range(1_000)]
+
+    def run():
+        for i in singles:
+            bm.get_book(i)
+        for idx in lists:
+            bm.get_book(idx)
+    return run, len(singles) + len(lists)
+
+
+@case("resort_within_indices")
+def resort_within_indices(scale, seed, tmp):
+    rng = random.Random(seed)
+    bm = _shelf_books(_n(20_000, scale), rng)
+    windows = []
+    for _ in range(2_000):
+        start = rng.randrange(len(bm) - 50)
+        window = list(range(start, start + 50))
+        rng.shuffle(window)
+        windows.append(window)
+    return (lambda: [bm.resort_within_indices(w) for w in windows]), len(windows)
+
+
+@case("group_fails")
+def group_fails(scale, seed, tmp):
+    bm = synthetic_session(_n(200, scale), 3, 4, np.random.default_rng(seed), n_books=1_000, shape=(8, 8, 3))
+    return (lambda: book_matcher.group_fails(bm)), len(bm)
+
+
+def _labelling_session(scale, seed, tmp):
+    """Loads a synthetic session into book_matcher (as create_app would); returns the fail count."""
+    n_books = len(book_matcher.book_database)
+    bm = synthetic_session(_n(40, scale), 2, 3, np.random.default_rng(seed), n_books=n_books, shape=(960, 1280, 3))
+    path = os.path.join(tmp, f"session-{seed}.bm")
+    if not os.path.exists(path):
+        save_to_dir(bm, path)
+    book_matcher.load_session(path, labels_path=os.path.join(tmp, f"labels-{seed}.sqlite"))
+    book_matcher.gr.update()  # import gradio outside the timed runs
+    return len(bm)
+
+
+@case("load_image")
+def load_image(scale, seed, tmp):
+    n = _labelling_session(scale, seed, tmp)
+
+    def run():
+        book_matcher.frames.clear()
+        for idx in range(n):
+            book_matcher.load_preview_rgb(idx)
+    return run, n
+
+
+@case("annotate")
+def annotate(scale, seed, tmp):
+    n = _labelling_session(scale, seed, tmp)
+    markers = []
+    for idx in range(n):
+        preview = book_matcher.load_preview_rgb(idx)  # cached: only the drawing is timed
+        s = preview.shape[1] / book_matcher.full_size(idx)[0]
+        skipped = "between_indices" in book_matcher.bm.book_infos[idx]
+        markers.append((preview, book_matcher.skip_marker(idx, s) if skipped else book_matcher.point_marker(idx, s)))
+
+    def run():
+        for preview, marker in markers:
+            book_matcher.Image.fromarray(render(preview, [marker]))
+    return run, n
+
+
+@case("next_entry_walk")
+def next_entry_walk(scale, seed, tmp):
+    n = _labelling_session(scale, seed, tmp)
+
+    def run():
+        book_matcher.frames.clear()
+        book_matcher.prefetcher.clear()
+        book_matcher.work_queue = WorkQueue(len(book_matcher.img_keys))
+        state, shown = START, 0
+        while True:
+            out = book_matcher.next_entry(state)
+            state = out[9]
+            if out[10] is None:
+                break
+            shown += 1
+        assert shown == n, f"walk showed {shown} of {n} fails"
+    return run, n
+
+
+def time_case(setup, scale, seed, tmp, repeats):
+    run, n = setup(scale, seed, tmp)
+    run()  # warm-up: imports, caches, allocator
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    return {
+        "n": n,
+        "seconds": seconds,
+        "median_s": statistics.median(seconds),
+        "min_s": min(seconds),
+        "per_op_s": statistics.median(seconds) / n,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names, scale=1.0, seed=0, repeats=5, log=print):
+    results = {}
+    tmp = tempfile.mkdtemp()
+    try:
+        for name in names:
+            results[name] = result = time_case(CASES[name], scale, seed, tmp, repeats)
+            log(f"{name:>24}: median {result['median_s'] * 1e3:9.2f} ms  min {result['min_s'] * 1e3:9.2f} ms  "
+                f"({result['per_op_s'] * 1e6:9.2f} us/op over {result['n']})")
+    finally:
+        shutil.rmtree(tmp)
+    return {
+        "format_version": FORMAT_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "scale": scale,
+            "seed": seed,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(before, after, threshold=0.1, stat="median_s"):
+    """[(name, before seconds, after seconds, ratio, status)] for the cases in both runs."""
+    rows = []
+    for name, old in before["results"].items():
+        new = after["results"].get(name)
+        if new is None:
+            continue
+        ratio = new[stat] / old[stat] if old[stat] > 0 else float("inf")
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, old[stat], new[stat], ratio, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time the cases and save the results")
+    run.add_argument("--out", help="JSON file to write (default: print only)")
+    run.add_argument("--only", nargs="+", choices=sorted(CASES), help="cases to run (default: all)")
+    run.add_argument("--scale", type=float, default=1.0, help="multiplies every case's data size")
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--seed", type=int, default=0)
+
+    cmp = commands.add_parser("compare", help="compare two result files; exit 1 on regressions")
+    cmp.add_argument("before")
+    cmp.add_argument("after")
+    cmp.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, as a fraction (0.1 = 10%%)")
+    cmp.add_argument("--stat", choices=["median_s", "min_s"], default="median_s")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(args.only or list(CASES), args.scale, args.seed, args.repeats)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"wrote {args.out}")
+        return 0
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before["meta"].get("scale") != after["meta"].get("scale"):
+        print(f"warning: runs used different --scale ({before['meta'].get('scale')} vs {after['meta'].get('scale')})")
+    rows = compare(before, after, args.threshold, args.stat)
+    for name, old, new, ratio, status in rows:
+        print(f"{name:>24}: {old * 1e3:9.2f} ms -> {new * 1e3:9.2f} ms  x{ratio:5.2f}  {status}")
+    regressions = [row[0] for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
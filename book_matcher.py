@@ -1,270 +1,345 @@
-import cv2
-import numpy as np
+from __future__ import annotations  # keeps gr.* / Image.* annotations from importing anything
+
+import argparse
+import importlib
+import logging
+import os
+import threading
+
 import book_memory
 from book_memory import BookMemory
 from database import book_database
-import gradio as gr
-import pickle
-import types
-import sys
-from collections import defaultdict
-from PIL import Image
-from PIL import ImageDraw
-from pathlib import Path
-import json
-import pprint
-import copy
-
-# --- stub top-level book_utils ---------------------------------
-stub = types.ModuleType("book_utils")
-stub.book_database = book_database
-stub.WagnerFischer = lambda *a, **kw: None
-
-# --- expose book_memory under the dotted name ------------------
-stub.book_memory = book_memory                   # attribute access
-sys.modules["book_utils"] = stub                 # top-level
-sys.modules["book_utils.book_memory"] = book_memory  # dotted path
-
-# --- unpickle ---------------------------------------------------
-with open("fails.pkl", "rb") as fh:
-    bm = pickle.load(fh)
-
-print("Loaded OK:", type(bm))
-
-# constants
-MANUAL = "Manually label book"
-new_bm = BookMemory()            # an "empty" bookmemory for storing final labels
-call_to_id = {                    # mapping call_number → its integer id in book_database
-    rec["call_number"]: int(k)
-    for k, rec in book_database.items()
-}
+from catalog import Catalog, load_catalog
+from frame_cache import FrameCache
+from metrics import Metrics
+from prefetch import Prefetcher
+from previews import Pyramid, to_full_resolution
+from annotate import Box, Circle, render
+from search_index import NgramIndex
+from labelling import START, LabelWriter, TraversalPlan, WorkQueue, label_image_id, labelled_fails, read_labels
 
-init_state = [0, "u", 0, 0, 0]
-
-# helper functions
-def load_image_rgb(idx: int) -> Image.Image:
-    """loads and converts a book image from bgr to rgb."""
-    bgr = bm.book_img_info[idx]["image"]
-    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(rgb)
-
-def build_manual_choices():
-    """
-    return a list of (label, value) tuples for every book in book_database,
-    where label = "call_number, alt_title" and value = the database id.
-    """
-    opts = []
-    for db_id, rec in book_database.items():
-        callnum   = rec.get("call_number", "")
-        alt_title = rec.get("alt_title", "")
-        if callnum or alt_title:
-            opts.append(f"{callnum}, {alt_title}")
-    # always append the manual flag as the last radio option
-    opts.append(MANUAL)
-    return opts
+class _LazyModule:
+    """Stands in for a heavy module and imports it on first attribute access."""
 
-def annotate_on_image(img, point, radius=30, color=(0, 255, 0, 64), width=2):
-    """annotates an image with a point (circle)."""
-    img = img.convert("RGBA")
+    def __init__(self, name):
+        self._name = name
 
-    # make a transparent overlay of the same size
-    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
 
-    x, y = point
-    r = radius
+# only the labelling UI needs these; headless users of this module never pay for them
+cv2 = _LazyModule("cv2")
+gr = _LazyModule("gradio")
+Image = _LazyModule("PIL.Image")
 
-    # draw a filled ellipse onto the overlay
-    draw.ellipse(
-        (x - r, y - r, x + r, y + r),
-        fill=color,        # semi-transparent fill
-        outline=None       # no border (optional)
-    )
+log = logging.getLogger("book_matcher")
 
-    # composite overlay onto the base image
-    return Image.alpha_composite(img, overlay)
-
-def annotate_skip_box(
-    img: Image.Image,
-    idx: int,
-    outline_color=(255, 0, 0),
-    outline_width=10,
-):
-    """annotates an image with a skip box (rectangle)."""
-    base = img.convert("RGBA")
-    orig_w, orig_h = base.size
-
-    # extract left/right x from book_positions, cast to int
-    left_x  = int(bm.book_positions[idx][0][0])
-    right_x = int(bm.book_positions[idx][1][0])
-
-    # create transparent overlay
-    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-    draw    = ImageDraw.Draw(overlay)
-
-    # draw only the rectangle outline
-    draw.rectangle(
-        [(left_x, 0), (right_x, orig_h)],
-        outline=outline_color + (255,),
-        width=outline_width
-    )
+# constants
+MANUAL = "Manually label book"
+DEFAULT_MEMORY = "fails.pkl"
+DEFAULT_LABELS = "labels.sqlite"
+PREFETCH_DEPTH = 4               # entries rendered ahead of the labeller
+CLAIM_LEASE = 30 * 60            # seconds a session may idle before its photo goes back to the work queue
+MANUAL_TOP_K = 20                # search results offered for a manual label
+PREVIEW_HEIGHT = 300             # display height of the photos; previews render from the nearest pyramid level
+POINT_MARKER = dict(radius=30, color=(0, 255, 0), alpha=64 / 255)  # unsure fails, in full-resolution pixels
+SKIP_MARKER = dict(color=(255, 0, 0), width=10)                    # skip boxes, in full-resolution pixels
+
+init_state = START               # nothing claimed yet; next_entry claims the session's first image
+
+# session data, filled in by load_session (create_app calls it)
+bm = None                        # the fails being labelled
+catalog = None                   # shelf-ordered; catalog.id_for_call_number maps call_number → id
+new_bm = None                    # an "empty" bookmemory for storing final labels
+img_groups = {}                  # image id → {"skipped": [[idx, ...], ...], "unsure": [idx, ...]}
+img_keys = []
+plan = None                      # TraversalPlan: every (image, mode, fail) step, in order
+work_queue = None                # hands each image group to one labelling session
+label_writer = None              # LabelWriter into the labels sqlite file
+new_bm_lock = threading.Lock()
+search_index = None              # NgramIndex over the catalog, built (or loaded) on the first manual search
+search_index_path = None         # where it is persisted: next to the catalog file, if there is one
+
+# decoded photos, pyramids and annotated renders, keyed by (kind, image id, params...)
+frames = FrameCache(max_bytes=512 * 1024 * 1024)
+# spans (next_entry, load_image, annotate, build_options, search, encode) and counters; see main's --metrics
+metrics = Metrics()
+metrics.register(lambda: {f"frame_cache_{k}": v for k, v in frames.stats().items() if k in ("hits", "misses")},
+                 kind="counter")
+metrics.register(lambda: {"frame_cache_bytes": frames.nbytes, "frame_cache_entries": len(frames)})
 
-    # composite and get combined image
-    combined = Image.alpha_composite(base, overlay)
-    return combined
+# helper functions
+def _image_key(idx):
+    """id of the photo book idx was seen in (its content hash), shared by every fail on that photo."""
+    return bm.book_img_info[idx].get("image_id", ("book", idx))
+
+def _timed(span, render):
+    """render, with the time each call takes recorded under span (e.g. for get_or_render, which only renders on a miss)."""
+    def run():
+        with metrics.span(span):
+            return render()
+    return run
+
+def full_size(idx):
+    """(width, height) of the full-resolution photo of book idx."""
+    h, w = bm.book_img_info[idx]["image"].shape[:2]
+    return w, h
+
+def load_preview_rgb(idx: int, height=PREVIEW_HEIGHT):
+    """
+    the photo of book idx downscaled to about `height` pixels (no smaller), as an rgb array
+    (cached; don't draw on it). the pyramid is built once per photo; scale coordinates by
+    preview width / full width.
+    """
+    def decode():
+        pyramid = frames.get_or_render(
+            ("pyramid", _image_key(idx), height),
+            lambda: Pyramid(bm.book_img_info[idx]["image"], min_height=height),
+        )
+        bgr, _ = pyramid.level_for(height)
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    return frames.get_or_render(("preview", _image_key(idx), height), _timed("load_image", decode))
+
+def point_marker(idx, scale=1.0):
+    """the circle marking unsure fail idx, in pixels of an image scaled by `scale`."""
+    x, y = bm.book_positions[idx][:2]
+    r = max(1, round(POINT_MARKER["radius"] * scale))
+    return Circle(x * scale, y * scale, r, POINT_MARKER["color"], POINT_MARKER["alpha"])
+
+def skip_marker(idx, scale=1.0):
+    """the box around the gap skipped fail idx was skipped in, spanning the full image height."""
+    left, right = bm.book_positions[idx]
+    w = max(1, round(SKIP_MARKER["width"] * scale))
+    h = full_size(idx)[1] * scale
+    return Box(int(left[0] * scale), 0, int(right[0] * scale), int(round(h)), SKIP_MARKER["color"], w)
+
+def get_search_index():
+    """the fuzzy search index of the current catalog, loading or building it on first use."""
+    global search_index
+    if search_index is None:
+        if search_index_path:
+            search_index = NgramIndex.load_or_build(search_index_path, catalog)
+        else:
+            search_index = NgramIndex.build(catalog)
+    return search_index
+
+def build_manual_choices(query, k=MANUAL_TOP_K):
+    """
+    (label, database id) pairs for the top k catalog books matching what the labeller typed,
+    where label = "call_number, alt_title". exact prefix matches come first, then the closest
+    fuzzy matches (typos, OCR noise). the full catalog is never sent to the browser.
+    """
+    with metrics.span("search"):
+        ids = catalog.search(query, k)
+        if len(ids) < k:
+            seen = set(ids)
+            ids += [db_id for db_id, _, _ in get_search_index().search(query, k, prefix=True) if db_id not in seen][:k - len(ids)]
+        return [(catalog.label(db_id), db_id) for db_id in ids]
+
+def render_unsure(idx: int, height=PREVIEW_HEIGHT) -> Image.Image:
+    """the preview of unsure fail idx with its point marked (cached)."""
+    x, y = bm.book_positions[idx][:2]
+    def draw():
+        preview = load_preview_rgb(idx, height)
+        scale = preview.shape[1] / full_size(idx)[0]
+        with metrics.span("annotate"):
+            return Image.fromarray(render(preview, [point_marker(idx, scale)]))
+    return frames.get_or_render(("point", _image_key(idx), height, float(x), float(y)), draw)
+
+def render_skipped(idx: int, height=PREVIEW_HEIGHT) -> Image.Image:
+    """the preview of skipped fail idx with the gap it was skipped in boxed (cached)."""
+    left, right = bm.book_positions[idx]
+    def draw():
+        preview = load_preview_rgb(idx, height)
+        scale = preview.shape[1] / full_size(idx)[0]
+        with metrics.span("annotate"):
+            return Image.fromarray(render(preview, [skip_marker(idx, scale)]))
+    return frames.get_or_render(("skip", _image_key(idx), height, int(left[0]), int(right[0])), draw)
 
 def build_radio_options(candidate_ids):
     """
     given bm.book_infos[book_id]['id'] (a list of ints or none),
-    return a list of strings of the form "call_number, alt_title".
+    return a list of (label, database id) pairs, label = "call_number, alt_title".
     skip any none or missing entries. then append the manual option.
     """
+    with metrics.span("build_options"):
+        return _radio_options(candidate_ids)
+
+def _radio_options(candidate_ids):
     opts = []
     for cid in candidate_ids:
-        if cid is None:
-            continue
-        info = book_database.get(str(cid))
-        if not info:
+        if cid is None or cid not in catalog:
             continue
-        callnum   = info.get("call_number", "")
-        alt_title = info.get("alt_title", "")
-        if callnum or alt_title:
-            opts.append(f"{callnum}, {alt_title}")
+        label = catalog.label(cid)  # formatted once per catalog
+        if label:
+            opts.append((label, int(cid)))
     # always append the manual flag as the last radio option
-    opts.append(MANUAL)
+    opts.append((MANUAL, MANUAL))
     return opts
 
 def load_text(idx):
     """loads the text associated with a given book id."""
     return str(bm.book_infos[idx]["id"])
 
-# group books by image
-img_groups = {}
-
-for idx, info in enumerate(bm.book_infos):
-    img_key = id(bm.book_img_info[idx]["image"])
-    # initialize: "skipped" starts as a dict mapping each between_indices value → list of idx
-    if img_key not in img_groups:
-        img_groups[img_key] = {"skipped": {}, "unsure": []}
+def group_fails(memory, exclude=()):
+    """
+    groups the fails of a memory by the photo they were seen in, leaving out the indices in
+    exclude (e.g. fails already labelled); photos with nothing left are dropped.
+    unsure fails are listed per photo; skipped fails are grouped by between_indices.
+    """
+    exclude = set(exclude)
+    groups = {}
+    for img_key, indices in memory.books_by_image().items():  # image id (content hash) → fails seen in that photo
+        indices = [idx for idx in indices if idx not in exclude]
+        if not indices:
+            continue
+        # initialize: "skipped" starts as a dict mapping each between_indices value → list of idx
+        groups[img_key] = {"skipped": {}, "unsure": []}
+
+        for idx in indices:
+            info = memory.book_infos[idx]
+            if "between_indices" in info:
+                bi = info["between_indices"]
+                # ensure bi is hashable; if it's a list, convert to tuple
+                if isinstance(bi, list):
+                    bi = tuple(bi)
+                groups[img_key]["skipped"].setdefault(bi, []).append(idx)
+            else:
+                groups[img_key]["unsure"].append(idx)
+
+    # after collecting everything, convert each "skipped" dict -> list of lists
+    for img_key, buckets in groups.items():
+        skipped_dict = buckets["skipped"]
+        groups[img_key]["skipped"] = list(skipped_dict.values())
+    return groups
+
+def load_session(memory_path=DEFAULT_MEMORY, catalog_path=None, labels_path=DEFAULT_LABELS):
+    """
+    loads the fails to label and the catalog, and groups the fails by photo.
+    memory_path is a legacy pickle or a save_to_dir directory (convert with:
+    python book_memory.py convert fails.pkl fails.bm); catalog_path is a json or
+    sqlite catalog, defaulting to database.book_database. labels are appended to the
+    sqlite file labels_path; fails already labelled there (by a labeller or auto_resolve.py)
+    are not shown again. labels match a fail by fail_idx and photo, so a labels file shared
+    between memories only hides each memory's own fails.
+    """
+    global bm, catalog, new_bm, img_groups, img_keys, search_index, search_index_path
+    global plan, work_queue, label_writer
+    if label_writer is not None:
+        label_writer.close()  # its last batch is mirrored into the old session's new_bm, against the old bm
+    catalog = load_catalog(catalog_path) if catalog_path else Catalog(book_database)
+    bm = book_memory.load_from_file(memory_path, database=catalog)
+    log.info("loaded %d fails from %s", len(bm), memory_path)
+    search_index, search_index_path = None, (catalog_path + ".ngram.npz" if catalog_path else None)
+    new_bm = BookMemory(catalog)
+    labelled = labelled_fails(read_labels(labels_path), bm)
+    img_groups = group_fails(bm, exclude=labelled)
+    img_keys = list(img_groups.keys())
+    plan = TraversalPlan(img_keys, img_groups)
+    work_queue = WorkQueue(len(img_keys), lease=CLAIM_LEASE)
+    label_writer = LabelWriter(labels_path, on_batch=mirror_labels)
+
+    frames.clear()
+    prefetcher.clear()
+    prefetcher.schedule(upcoming_entries(init_state))  # the first page is rendered while gradio starts
+
+def record_label(fail_idx, labeller, **fields):
+    """queues a label for the sqlite file (and new_bm); returns immediately."""
+    label_writer.write(fail_idx=int(fail_idx), image_id=label_image_id(bm, fail_idx), labeller=labeller, **fields)
+    metrics.inc("labels")
+
+def mirror_labels(labels):
+    """LabelWriter batch hook: adds the books labelled as seen to new_bm."""
+    with new_bm_lock:
+        for label in labels:
+            if label["book_id"] is None or label.get("found") == 0:
+                continue
+            idx = label["fail_idx"]
+            info = {"id": label["book_id"], "fail_idx": idx, "labeller": label["labeller"]}
+            if label.get("click_x") is not None:
+                info["click"] = (label["click_x"], label["click_y"])
+            new_bm.add_book(bm.book_positions[idx], info, dict(bm.book_img_info[idx]))
+
+def _labeller(request):
+    """the gradio session a callback runs for ("local" when called directly)."""
+    return getattr(request, "session_hash", None) or "local"
 
-    if "between_indices" in info:
-        bi = info["between_indices"]
-        # ensure bi is hashable; if it's a list, convert to tuple
-        if isinstance(bi, list):
-            bi = tuple(bi)
-        img_groups[img_key]["skipped"].setdefault(bi, []).append(idx)
-    else:
-        img_groups[img_key]["unsure"].append(idx)
+# callback functions
+def upcoming_entries(cursor, n=PREFETCH_DEPTH):
+    """the (book_id, fail_mode) of the next n entries after cursor, in order, assuming the queue's next images."""
+    return [(plan[step][2], plan[step][1]) for step in plan.upcoming(cursor, work_queue, n)]
 
-# after collecting everything, convert each "skipped" dict -> list of lists
-for img_key, buckets in img_groups.items():
-    skipped_dict = buckets["skipped"]
-    img_groups[img_key]["skipped"] = list(skipped_dict.values())
+def render_entry(entry):
+    """the annotated image (and, for unsure fails, the radio options) for a (book_id, fail_mode) entry."""
+    book_id, fail_mode = entry
+    if fail_mode == "u":
+        return render_unsure(book_id), build_radio_options(bm.book_infos[book_id]["id"])
+    return render_skipped(book_id), None
 
-img_keys = list(img_groups.keys())
+prefetcher = Prefetcher(render_entry, max_workers=2)
 
-# callback functions
-def next_entry(state):
+def next_entry(state, request: gr.Request = None):
     """
-    advances the browser to the next book entry based on the current state.
-    handles switching between 'unsure' and 'skipped' modes, and iterating through images and book groups.
-    returns a tuple of gradio updates and the new state.
+    advances the browser to the next book entry: the next unsure or skipped fail of the
+    image on screen, or the first of the next image this session claims from the work queue.
+    returns a tuple of gradio updates, the new state and the fail now on screen.
     """
-    print(f"[debug] next_entry: called with state={state}")
-    img_i, fail_mode, u_book_i, s_group_i, s_book_i = state
-
-    if img_i >= len(img_keys):
-        print(f"[debug] next_entry: img_i out of range, returning end state")
+    labeller = _labeller(request)
+    with metrics.span("next_entry"):
+        return show_entry(plan.advance(state, work_queue, labeller), labeller)
+
+def on_back(state, request: gr.Request = None):
+    """the back button: shows the previous fail of this session again (answering it again adds a new label)."""
+    return show_entry(plan.back(state), _labeller(request)) + (gr.update(visible=False),)
+
+def on_skip_image(state, request: gr.Request = None):
+    """the skip image button: leaves the rest of this photo unanswered and moves on to the next one."""
+    labeller = _labeller(request)
+    return show_entry(plan.skip_image(state, work_queue, labeller), labeller) + (gr.update(visible=False),)
+
+def on_unload(request: gr.Request = None):
+    """the tab closed or reloaded: hands its photo to the next session and drops its prefetch window."""
+    labeller = _labeller(request)
+    work_queue.release(labeller)
+    prefetcher.forget(labeller)
+
+def show_entry(cursor, labeller):
+    """the gradio updates showing the step cursor is on (or the end of the session)."""
+    log.debug("show_entry: cursor=%s, labeller=%s", cursor, labeller)
+    work_queue.touch(labeller)
+
+    if cursor.shown is None:
+        log.debug("show_entry: no images left for %s", labeller)
         return (
             gr.update(),            # image for unsure mode
             gr.update(visible=False),  # radio for unsure mode
             gr.update(visible=False),  # manual dropdown
             gr.update(),            # image for skipped mode
             gr.update(),            # text for skipped mode
+            gr.update(visible=False),  # found radio
+            gr.update(),            # status for skipped mode
             gr.update(visible=False),  # group for unsure mode
             gr.update(visible=False),  # group for skipped mode
-            state,
-            None # current_display_book_id (none for end state)
+            cursor,
+            None, # current_display_book_id (none for end state)
+            gr.update(visible=False),  # manual search box
         )
-
-    img_key = img_keys[img_i]
-    unsure_ids = img_groups[img_key]["unsure"]
-    skipped_ids = img_groups[img_key]["skipped"]
-
-    # unsure mode but there are no unsure ids at all, switch to skipped
-    if fail_mode == "u" and not unsure_ids:
-        print(f"[debug] next_entry: switching to skipped mode")
-        return next_entry([img_i, "s", 0, 0, 0])
-
-    if fail_mode == "s" and not skipped_ids:
-        print(f"[debug] next_entry: no skipped_ids, advancing to next image")
-        return next_entry([img_i + 1, "u", 0, 0, 0])
-    
-    mode_ids = unsure_ids if fail_mode == "u" else skipped_ids
-
-    if fail_mode == "u":
-        if u_book_i >= len(unsure_ids):
-            # print(f"[debug] next_entry: all unsure shown, switching to skipped mode")
-            return next_entry([img_i, "s", 0, 0, 0])
-        book_id = unsure_ids[u_book_i]
-    else:  # fail_mode == "s"
-        # find between group
-        if s_group_i >= len(skipped_ids):
-            # print(f"[debug] next_entry: finished sublist, advancing to next image")
-            # next image
-            return next_entry([img_i + 1, "u", 0, 0, 0])
-        current_sublist = skipped_ids[s_group_i]
-        # sub list (between) go next
-        if s_book_i >= len(current_sublist):
-            # print(f"[debug] next_entry: finished this sublist, advancing to next sublist")
-            return next_entry([img_i, "s", 0, s_group_i + 1, 0])
-        book_id = current_sublist[s_book_i]
+    _, fail_mode, book_id = plan[cursor.shown]
 
     text = load_text(book_id)
-    # print(f"[debug] next_entry: fail_mode={fail_mode}, book_id={book_id}, text={text}")
-
-    img = load_image_rgb(book_id)
 
-    next_img_i    = img_i
-    next_mode     = fail_mode
-    next_u_book_i = u_book_i
-    next_s_group  = s_group_i
-    next_s_book   = s_book_i
+    # rendered ahead of time by the prefetcher if the labeller didn't outrun it
+    entry = (book_id, fail_mode)
+    prefetched = prefetcher.take(entry)
+    metrics.inc("prefetch_hits" if prefetched else "prefetch_misses")
+    img, radio_labels = prefetched or render_entry(entry)
+    prefetcher.schedule(upcoming_entries(cursor), owner=labeller)
 
-    if fail_mode == "u":
-        next_u_book_i += 1
-        if next_u_book_i >= len(unsure_ids):
-            # we've shown all "unsure" for this image → go to first skipped sublist
-            next_mode     = "s"
-            next_u_book_i = 0
-            next_s_group  = 0
-            next_s_book   = 0
-    else:  # "s"
-        next_s_book += 1
-        current_sublist = skipped_ids[s_group_i]
-        if next_s_book >= len(current_sublist):
-            # finished this sublist → advance to next sublist
-            next_s_group += 1
-            next_s_book  = 0
-            # if that was the last sublist, next call to next_entry will push to next image
-
-    new_state = [next_img_i, next_mode, next_u_book_i, next_s_group, next_s_book]
-    print(f"new state: {new_state}")
     if fail_mode == "u":          # unsure layout now active
-       # point on book
-        point = bm.book_positions[book_id]
-        img = annotate_on_image(img, point)
-  
-        candidate_ids = bm.book_infos[book_id]["id"]
-        radio_labels = build_radio_options(candidate_ids)
         radio_update = gr.update(choices=radio_labels, value=None, visible=True)
 
-        # dropdown stays hidden until user picks manual
-        manual_update = gr.update(choices=build_manual_choices(),
-                                  value=None,
-                                  visible=False)
-        returned_state = copy.deepcopy(new_state)
-        # print(f"[debug] next_entry: returning unsure state: {returned_state}")
+        # search box and dropdown stay hidden until user picks manual; results come from on_manual_search
+        manual_update = gr.update(choices=[], value=None, visible=False)
         return (
             gr.update(value=img, visible=True), # image for unsure mode
             radio_update,
@@ -279,27 +354,22 @@ def next_entry(state):
             gr.update(visible=True),
             gr.update(visible=False),
 
-            returned_state,
-            None # current_display_book_id (none for unsure, as we don't need to click it yet)
+            cursor,
+            book_id, # current_display_book_id: the unsure fail the radio answer is for
+            gr.update(value="", visible=False), # manual search box
         )
 
     else:                    # skipped layout active
-        # load the base pil image
-        base_img = load_image_rgb(book_id)  # returns rgb → convert in helper
-        # overlay skip-box
-        img_with_box = annotate_skip_box(base_img, book_id)
+        img_with_box = img  # base image with the skip-box overlaid
         skipped_str = "skipped " + text
 
         # Get call_number and alt_title for the dynamic label
-        print(f"[debug] next_entry: building dynamic label for book_id={book_id}")
-        book_info = book_database.get(str(book_id))
+        book_info = catalog.get(book_id)
         callnum = book_info.get("call_number", "") if book_info else ""
         alt_title = book_info.get("alt_title", "") if book_info else ""
         dynamic_radio_label = f"Is this book {callnum}, {alt_title} in the masked area?"
-        print(f"[debug] next_entry: dynamic_radio_label={dynamic_radio_label}")
+        log.debug("show_entry: dynamic_radio_label=%s", dynamic_radio_label)
 
-        returned_state = copy.deepcopy(new_state) # return new_state as current_display_book_id will store the current one.
-        # print(f"[debug] next_entry: returning skipped state: {returned_state}")
         return (
             gr.update(visible=False), # hide image for unsure mode
             gr.update(visible=False),
@@ -313,30 +383,40 @@ def next_entry(state):
             gr.update(visible=False), # hide group for unsure mode
             gr.update(visible=True), # show group for skipped mode
 
-            returned_state,
-            book_id # new: output the book_id of the currently displayed skipped book
+            cursor,
+            book_id, # new: output the book_id of the currently displayed skipped book
+            gr.update(visible=False), # manual search box
         )
 
+def on_next(choice, manual_choice, state, current_display_book_id, request: gr.Request = None):
+    """the next button: records the match picked for the unsure fail on screen (if any), then advances."""
+    book_id = manual_choice if choice == MANUAL else choice
+    if current_display_book_id is not None and book_id not in (None, MANUAL) \
+            and "between_indices" not in bm.book_infos[current_display_book_id]:
+        record_label(current_display_book_id, _labeller(request), kind="unsure", book_id=int(book_id))
+    return next_entry(state, request)
+
 def on_radio_change(choice):
-    """handles the change event of the radio buttons, toggling manual dropdown visibility."""
-    if choice == MANUAL:
-        return gr.update(visible=True)
-    return gr.update(visible=False)
+    """handles the change event of the radio buttons, toggling the manual search box and dropdown."""
+    manual = choice == MANUAL
+    return gr.update(value="", visible=manual), gr.update(choices=[], value=None, visible=manual)
 
-def on_found_radio(answer, state, current_display_book_id):
+def on_manual_search(query):
+    """refreshes the manual dropdown with the top matches for the text typed so far."""
+    return gr.update(choices=build_manual_choices(query), value=None)
+
+def on_found_radio(answer, state, current_display_book_id, request: gr.Request = None):
     """handles the user's response to whether a book is in the masked area."""
-    print(f"[debug] on_found_radio START: answer={answer}, state={state}, current_display_book_id={current_display_book_id}")
-    img_i, mode, ub, sg, sb = state
+    log.debug("on_found_radio: answer=%s, state=%s, current_display_book_id=%s", answer, state, current_display_book_id)
 
     if answer is None:
         # if no answer is selected (e.g., initial display of cleared radio), do nothing or keep current state
         book_id = current_display_book_id
-        base_img = load_image_rgb(book_id)
-        img_with_box = annotate_skip_box(base_img, book_id)
+        img_with_box = render_skipped(book_id)
         skipped_str  = f"skipped {load_text(book_id)}"
 
         # Get call_number and alt_title for the dynamic label
-        book_info = book_database.get(str(book_id))
+        book_info = catalog.get(book_id)
         callnum = book_info.get("call_number", "") if book_info else ""
         alt_title = book_info.get("alt_title", "") if book_info else ""
         dynamic_radio_label = f"Is this book {callnum}, {alt_title} in the masked area?"
@@ -348,16 +428,17 @@ def on_found_radio(answer, state, current_display_book_id):
             gr.update(value="", visible=True),  # status_skipped (clear it)
             gr.update(visible=False),  # text_s - NEW
             gr.update(visible=True),                     # grp_skipped
-            copy.deepcopy(state),                        # keep the current state
+            state,                                       # keep the current state
             current_display_book_id                      # pass through current_display_book_id
         )
 
     if answer == "No":
         book_id = current_display_book_id # use the explicitly displayed book id
         text = load_text(book_id)
-        print(f"[debug] on_found_radio: book_id={book_id}, text={text}")
-        base = next_entry(state) # this will return the new_state for the next item (11 outputs)
-        print(f"[debug] on_found_radio: advancing to next entry, new state={base[-2]}") # adjusted index for new output
+        log.debug("on_found_radio: book_id=%s, text=%s", book_id, text)
+        record_label(book_id, _labeller(request), kind="skipped", book_id=_single_id(book_id), found=0)
+        base = next_entry(state, request) # this will return the new_state for the next item
+        log.debug("on_found_radio: advancing to next entry, new state=%s", base[9])
         # base outputs: [img_u, radio_u, manual_dd, img_s, text_s, found_radio, status_skipped, grp_unsure, grp_skipped, state, current_display_book_id]
         return (
             base[3],  # image for skipped mode
@@ -366,20 +447,19 @@ def on_found_radio(answer, state, current_display_book_id):
             base[6],  # status for skipped mode
             base[4],  # text for skipped mode
             base[8],  # group for skipped mode
-            copy.deepcopy(base[9]),  # state
+            base[9],  # state
             base[10]  # current_display_book_id
         )
 
     # "yes" → show the clickable overlay, use current_display_book_id
     book_id = current_display_book_id # use the explicit current book id
     text = load_text(book_id)
-    print(f"[debug] on_found_radio: book_id={book_id}, text={text}")
+    log.debug("on_found_radio: book_id=%s, text=%s", book_id, text)
 
-    base_img     = load_image_rgb(book_id)
-    img_with_box = annotate_skip_box(base_img, book_id)
+    img_with_box = render_skipped(book_id)
     skipped_str  = f"skipped {text}"
 
-    print(f"[debug] on_found_radio: staying on current entry, state={state}, text={skipped_str}")
+    log.debug("on_found_radio: staying on current entry, state=%s, text=%s", state, skipped_str)
     # keep the same state and show interactive elements
     return (
         gr.update(value=img_with_box, visible=False), # hide static image
@@ -388,36 +468,31 @@ def on_found_radio(answer, state, current_display_book_id):
         gr.update(value="Please click on the book location.", visible=True),  # show status message
         gr.update(visible=False),  # text_s - NEW
         gr.update(visible=True),                     # keep group visible
-        copy.deepcopy(state),                        # keep the (possibly advanced) main state
+        state,                                       # keep the main state
         current_display_book_id                      # pass through current_display_book_id
     )
 
-def on_click_book(evt: gr.SelectData, image_component, state):
+def on_click_book(evt: gr.SelectData, image_component, state, current_display_book_id, request: gr.Request = None):
     """handles clicks on the interactive image, saves the click location, and advances to the next entry."""
-    print(f"[debug] on_click_book: evt={evt}, image_component={image_component}, state={state}")
-    # unpack the state tuple
-    img_i, fail_mode, u_book_i, s_group_i, s_book_i = state
-
-    # find which shelf-photo group we're in
-    img_key     = img_keys[img_i]
-    skipped_ids = img_groups[img_key]["skipped"]  # a list of lists
-
-    # grab the current sublist and the specific book index
-    current_sublist = skipped_ids[s_group_i]
-    book_id         = current_sublist[s_book_i]
+    log.debug("on_click_book: evt=%s, image_component=%s, state=%s", evt, image_component, state)
+    # current_display_book_id is the fail clicked on
+    book_id = current_display_book_id
     text = load_text(book_id)
-    print(f"[debug] on_click_book: book_id={book_id}, text={text}")
+    log.debug("on_click_book: book_id=%s, text=%s", book_id, text)
 
-    # now evt.index gives you (x, y)
+    # evt.index is (x, y) in the displayed preview; map it back to the full-resolution photo
     x, y = evt.index
-    print(f"[debug] on_click_book: x={x}, y={y}")
+    if image_component is not None:
+        x, y = to_full_resolution((x, y), image_component.size, full_size(book_id))
+    log.debug("on_click_book: x=%s, y=%s", x, y)
 
     # save that click
-    #new_bm.add_book(book_id, x, y)
+    record_label(book_id, _labeller(request), kind="skipped", book_id=_single_id(book_id),
+                 found=1, click_x=float(x), click_y=float(y))
 
     # advance to the next entry
-    base_updates = next_entry(state)
-    print(f"[debug] on_click_book: advancing to next entry, new state={base_updates[-2]}") # adjusted index
+    base_updates = next_entry(state, request)
+    log.debug("on_click_book: advancing to next entry, new state=%s", base_updates[9])
     # base_updates is a tuple of 8 component updates + the new state + current_display_book_id
 
     # return exactly the same number of outputs,
@@ -431,159 +506,244 @@ def on_click_book(evt: gr.SelectData, image_component, state):
         gr.update(visible=False),  # img_clickable - NEW
         base_updates[7],           # group for unsure mode
         base_updates[8],           # group for skipped mode
-        copy.deepcopy(base_updates[9]), # state
+        base_updates[9],           # state
         gr.update(value=""),       # status for skipped mode (clear it)
         base_updates[10],           # current_display_book_id
-        base_updates[5]            # found_radio - NEW
+        base_updates[5],           # found_radio - NEW
+        base_updates[11],          # manual search box
     )
 
+def _single_id(fail_idx):
+    """the catalog id of a skipped fail (its info["id"]), or None if it isn't a single int."""
+    try:
+        return int(bm.book_infos[fail_idx]["id"])
+    except (TypeError, ValueError):
+        return None
+
+def _time_encoding(component, span="encode"):
+    """records the time gradio takes to encode component's value for the browser (its postprocess) under span."""
+    postprocess = component.postprocess
+    def timed(value):
+        if value is None:
+            return postprocess(value)
+        with metrics.span(span):
+            return postprocess(value)
+    component.postprocess = timed
+
 # gradio ui
 CSS = """
 #book_choices label span { white-space: pre-wrap; }
 body ul.options[role="listbox"] { max-height:220px!important;overflow-y:auto!important;overflow-x:hidden!important;}
 """
 
-with gr.Blocks(title="book browser", css=CSS) as demo:
-    gr.Markdown("### Browse Entries")
-    state = gr.State(init_state)
-    current_display_book_id = gr.State(None) # new state component
-
-    with gr.Group(visible=True) as grp_unsure:
-        img_u    = gr.Image(type="pil", height=300, label="")
-        radio_u  = gr.Radio(
-            choices=[],
-            label="Choose one of these matches:",
-            visible=False,
-            interactive=True,
-        )
-        manual_dd = gr.Dropdown(
-            choices=[],
-            label="manual entry:",
-            value=None,
-            visible=False,
-            allow_custom_value=False,
-            interactive=True,
-        )
+def create_app(memory_path=DEFAULT_MEMORY, catalog_path=None, labels_path=DEFAULT_LABELS, concurrency=16):
+    """
+    loads the session and builds the labelling ui; returns the gr.Blocks app.
+    every browser tab is its own labelling session; up to `concurrency` callbacks run at once.
+    """
+    load_session(memory_path, catalog_path, labels_path)
+
+    with gr.Blocks(title="book browser", css=CSS) as demo:
+        gr.Markdown("### Browse Entries")
+        state = gr.State(init_state)
+        current_display_book_id = gr.State(None) # new state component
+
+        with gr.Group(visible=True) as grp_unsure:
+            img_u    = gr.Image(type="pil", height=PREVIEW_HEIGHT, label="")
+            radio_u  = gr.Radio(
+                choices=[],
+                label="Choose one of these matches:",
+                visible=False,
+                interactive=True,
+            )
+            manual_search = gr.Textbox(
+                label="search the catalog (call number or title):",
+                placeholder="e.g. DS793 .K7 or 广东",
+                visible=False,
+                interactive=True,
+            )
+            manual_dd = gr.Dropdown(
+                choices=[],
+                label="manual entry:",
+                value=None,
+                visible=False,
+                allow_custom_value=False,
+                interactive=True,
+            )
+
+            status_u = gr.Markdown(value="", visible=True)   # for warnings
+
+            # whenever the radio value changes, run on_radio_change to toggle the manual search
+            radio_u.change(
+                on_radio_change,
+                inputs=[radio_u],
+                outputs=[manual_search, manual_dd]
+            )
+
+            # search server-side as the labeller types; only the top matches reach the browser
+            manual_search.input(
+                on_manual_search,
+                inputs=[manual_search],
+                outputs=[manual_dd],
+                trigger_mode="always_last",
+            )
+
+        with gr.Group(visible=False) as grp_skipped:
+            # non-interactive "masked" image
+            img_s = gr.Image(
+                type="pil",
+                height=PREVIEW_HEIGHT,
+                label="",
+                visible=False
+            )
+
+            # interactive version (same spot/size), initially hidden
+            img_clickable = gr.Image(
+                type="pil",
+                height=PREVIEW_HEIGHT,
+                label="",
+                interactive=False, # changed to false
+                visible=False
+            )
+
+            text_s = gr.Markdown(visible=False)  # Remove the comment about skipped_id
+
+            found_radio = gr.Radio(
+                choices=["Yes", "No"],
+                label="Is this book in the masked area?",
+                visible=False,
+                interactive=True,
+                value=None # ensure it's not selected by default
+            )
+
+            status_skipped = gr.Markdown(value="", visible=True)
+
+            found_radio.change(
+                on_found_radio,
+                inputs=[found_radio, state, current_display_book_id], # add current_display_book_id
+                outputs=[
+                    img_s,           # show/hide static image
+                    found_radio,     # show/hide the radio
+                    img_clickable,   # show/hide interactive image
+                    status_skipped,  # warning prompt
+                    text_s,          # "skipped {book_id}" text
+                    grp_skipped,     # keep group visible
+                    state,           # keep main state
+                    current_display_book_id # pass through current_display_book_id, it is not modified here
+                ]
+            )
+
+            img_clickable.select(
+                on_click_book,          # callback(evt, image_component, state)
+                inputs=[img_clickable, state, current_display_book_id],  # image, state and the fail on screen
+                outputs=[
+                    img_u, radio_u, manual_dd,
+                    img_s, text_s, img_clickable,
+                    grp_unsure, grp_skipped,
+                    state,              # now only this callback updates state
+                    status_skipped,
+                    current_display_book_id, # pass through current_display_book_id, it is updated by next_entry
+                    found_radio, # new output
+                    manual_search
+                ]
+            )
+
+        for image in (img_u, img_s, img_clickable):
+            _time_encoding(image)
+
+        with gr.Row():
+            back = gr.Button("← back")
+            skip_image = gr.Button("skip image")
+            nxt = gr.Button("next →")
+
+        # first load on page render
+        demo.load(
+            next_entry,
+            inputs=[state],
+            outputs=[
+                img_u,           # image for unsure mode
+                radio_u,         # radio for unsure mode
+                manual_dd,       # manual dropdown
 
-        status_u = gr.Markdown(value="", visible=True)   # for warnings
+                img_s,           # image for skipped mode
+                text_s,          # text for skipped mode
 
-        # whenever the radio value changes, run on_radio_change to toggle manual_dd
-        radio_u.change(
-            on_radio_change,
-            inputs=[radio_u],
-            outputs=[manual_dd],
-            queue=False
-        )
+                found_radio,     # found radio
+                status_skipped,  # status for skipped mode
 
-    with gr.Group(visible=False) as grp_skipped:
-        # non-interactive "masked" image
-        img_s = gr.Image(
-            type="pil",
-            height=300,
-            label="",
-            visible=False
-        )
+                grp_unsure,      # group for unsure mode
+                grp_skipped,     # group for skipped mode
 
-        # interactive version (same spot/size), initially hidden
-        img_clickable = gr.Image(
-            type="pil",
-            height=300,
-            label="",
-            interactive=False, # changed to false
-            visible=False
+                state,           # state
+                current_display_book_id, # new output
+                manual_search    # manual search box
+            ]
         )
 
-        text_s = gr.Markdown(visible=False)  # Remove the comment about skipped_id
+        # subsequent clicks
+        nxt.click(
+            on_next,
+            inputs=[radio_u, manual_dd, state, current_display_book_id],
+            outputs=[
+                img_u,           # image for unsure mode
+                radio_u,         # radio for unsure mode
+                manual_dd,       # manual dropdown
 
-        found_radio = gr.Radio(
-            choices=["Yes", "No"],
-            label="Is this book in the masked area?",
-            visible=False,
-            interactive=True,
-            value=None # ensure it's not selected by default
-        )
+                img_s,           # image for skipped mode
+                text_s,          # text for skipped mode
 
-        status_skipped = gr.Markdown(value="", visible=True)
+                found_radio,     # found radio
+                status_skipped,  # status for skipped mode
 
-        found_radio.change(
-            on_found_radio,
-            inputs=[found_radio, state, current_display_book_id], # add current_display_book_id
-            outputs=[
-                img_s,           # show/hide static image
-                found_radio,     # show/hide the radio
-                img_clickable,   # show/hide interactive image
-                status_skipped,  # warning prompt
-                text_s,          # "skipped {book_id}" text
-                grp_skipped,     # keep group visible
-                state,           # keep main state
-                current_display_book_id # pass through current_display_book_id, it is not modified here
-            ],
-            queue=False
-        )
+                grp_unsure,      # group for unsure mode
+                grp_skipped,     # group for skipped mode
 
-        img_clickable.select(
-            on_click_book,          # callback(evt, image_component, state)
-            inputs=[img_clickable, state],  # pass image component and state
-            outputs=[
-                img_u, radio_u, manual_dd,
-                img_s, text_s, img_clickable,
-                grp_unsure, grp_skipped,
-                state,              # now only this callback updates state
-                status_skipped,
-                current_display_book_id, # pass through current_display_book_id, it is updated by next_entry
-                found_radio # new output
+                state,           # state
+                current_display_book_id, # new output
+                manual_search    # manual search box
             ],
-            queue=False
         )
 
-    nxt = gr.Button("next →")
-
-    # first load on page render
-    demo.load(
-        next_entry,
-        inputs=[state],
-        outputs=[
-            img_u,           # image for unsure mode
-            radio_u,         # radio for unsure mode
-            manual_dd,       # manual dropdown
-
-            img_s,           # image for skipped mode
-            text_s,          # text for skipped mode
-
-            found_radio,     # found radio
-            status_skipped,  # status for skipped mode
-
-            grp_unsure,      # group for unsure mode
-            grp_skipped,     # group for skipped mode
-
-            state,           # state
-            current_display_book_id # new output
-        ],
-        queue=False
-    )
-
-    # subsequent clicks
-    nxt.click(
-        next_entry,
-        inputs=[state],
-        outputs=[
-            img_u,           # image for unsure mode
-            radio_u,         # radio for unsure mode
-            manual_dd,       # manual dropdown
-
-            img_s,           # image for skipped mode
-            text_s,          # text for skipped mode
-
-            found_radio,     # found radio
-            status_skipped,  # status for skipped mode
-
-            grp_unsure,      # group for unsure mode
-            grp_skipped,     # group for skipped mode
-
-            state,           # state
-            current_display_book_id # new output
-        ],
-    )
+        # the same updates as next, plus hiding the clickable image if the labeller was about to click
+        navigation_outputs = [
+            img_u, radio_u, manual_dd,
+            img_s, text_s,
+            found_radio, status_skipped,
+            grp_unsure, grp_skipped,
+            state, current_display_book_id, manual_search,
+            img_clickable,
+        ]
+        back.click(on_back, inputs=[state], outputs=navigation_outputs)
+        skip_image.click(on_skip_image, inputs=[state], outputs=navigation_outputs)
+        demo.unload(on_unload)
+
+    demo.queue(default_concurrency_limit=concurrency)
+    return demo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="label unsure and skipped book fails")
+    parser.add_argument("--memory", default=DEFAULT_MEMORY,
+                        help="fails to label: a BookMemory pickle or save_to_dir directory")
+    parser.add_argument("--catalog", default=None,
+                        help="catalog json or sqlite file (default: database.book_database)")
+    parser.add_argument("--labels", default=DEFAULT_LABELS,
+                        help="sqlite file the labels are written to (and resumed from)")
+    parser.add_argument("--log-level", default=os.environ.get("BOOK_MATCHER_LOG_LEVEL", "WARNING"),
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG logs every callback's state (default: $BOOK_MATCHER_LOG_LEVEL or WARNING)")
+    parser.add_argument("--metrics", default=None,
+                        help="file to export timings and counters to: Prometheus text if it ends in .prom "
+                             "(rewritten each time), else JSON lines (appended)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="seconds between metrics exports")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    app = create_app(args.memory, args.catalog, args.labels)
+    if args.metrics:
+        metrics.start_export(args.metrics, args.metrics_interval)
+    try:
+        app.launch()
+    finally:
+        metrics.stop_export()
 
 if __name__ == "__main__":
-    demo.launch() 
\ No newline at end of file
+    main()
@@ -1,12 +1,15 @@
 import numpy as np
 import sys 
 import os 
+import json
+import pickle
+import hashlib
+from bisect import insort
 
 # import Levenshtein
 
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from scipy.spatial.transform import Rotation as R
+# matplotlib and scipy are imported where they are used: plotting and the spatial index
+# are optional, and importing them up front triples the import time of this module
 
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 sys.path.append(os.path.join(os.path.dirname(__file__), 'book_utils'))
@@ -14,10 +17,335 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # from robot import project_book_on_cam_vec, get_hand_cam_extrinsics
 from database import book_database
+from catalog import load_catalog
+
+def _id_key(book_id):
+    """
+    Hashable stand-in for an info['id'] with the same equality as ==.
+    Fails store a list of candidate ids; it is tagged so [1, 2] never matches (1, 2).
+    """
+    if isinstance(book_id, np.ndarray):
+        book_id = book_id.tolist()
+    if isinstance(book_id, list):
+        return (list, tuple(_id_key(b) for b in book_id))
+    return book_id
+
+class PositionStore:
+    """
+    Columnar, growable storage behind BookMemory.book_positions.
+
+    Each book has a start point, an end point (only set for skipped-book fails,
+    which are stored as the two points the book was skipped between), a kind
+    (POINT or RANGE) and its number of coordinates (2 for pixel, 3 for world
+    positions). Columns are preallocated and doubled when full, and windows over
+    them come back as numpy views, so nothing is rebuilt from per-book objects.
+
+    Indexing behaves like the old list: a point comes back as an array, a range
+    as a [start, end] list of arrays (both copies).
+    """
+    POINT, RANGE = 0, 1
+    DIM = 3
+
+    def __init__(self, positions=(), capacity=16):
+        capacity = max(capacity, len(positions), 1)
+        self._start = np.full((capacity, self.DIM), np.nan)
+        self._end = np.full((capacity, self.DIM), np.nan)
+        self._kind = np.zeros(capacity, dtype=np.uint8)
+        self._ndim = np.zeros(capacity, dtype=np.uint8)
+        self._n = 0
+        self.listener = None  # called with the index of every written book (see SpatialIndex)
+        for position in positions:
+            self.append(position)
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return (self[i] for i in range(self._n))
+
+    def __getstate__(self):
+        n = self._n
+        return {"start": self._start[:n].copy(), "end": self._end[:n].copy(),
+                "kind": self._kind[:n].copy(), "ndim": self._ndim[:n].copy()}
+
+    def __setstate__(self, state):
+        self._start, self._end = state["start"], state["end"]
+        self._kind, self._ndim = state["kind"], state["ndim"]
+        self._n = len(self._kind)
+        self.listener = None
+
+    def _index(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("position index out of range")
+        return i
+
+    def _grow(self, needed):
+        capacity = max(len(self._kind), 1)
+        if needed <= len(self._kind):
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_start", "_end"):
+            old = getattr(self, name)
+            new = np.full((capacity, self.DIM), np.nan)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+        for name in ("_kind", "_ndim"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def _write(self, i, position):
+        arr = np.asarray(position, dtype=float)
+        if arr.ndim == 2:  # [left point, right point] of a skipped book
+            start, end, kind = arr[0], arr[1], self.RANGE
+        else:
+            start, end, kind = arr, None, self.POINT
+        nd = len(start)
+        self._start[i] = np.nan
+        self._start[i, :nd] = start
+        self._end[i] = np.nan
+        if end is not None:
+            self._end[i, :nd] = end
+        self._kind[i] = kind
+        self._ndim[i] = nd
+        if self.listener is not None:
+            self.listener(i)
+
+    def append(self, position):
+        self._grow(self._n + 1)
+        self._write(self._n, position)
+        self._n += 1
+
+    def __setitem__(self, i, position):
+        self._write(self._index(i), position)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        i = self._index(i)
+        nd = self._ndim[i]
+        if self._kind[i] == self.RANGE:
+            return [self._start[i, :nd].copy(), self._end[i, :nd].copy()]
+        return self._start[i, :nd].copy()
+
+    def is_range(self, i):
+        return self._kind[self._index(i)] == self.RANGE
+
+    def window(self, start, stop):
+        """Zero-copy (starts, ends, kinds) views for books start..stop-1."""
+        start, stop, _ = slice(start, stop).indices(self._n)
+        return self._start[start:stop], self._end[start:stop], self._kind[start:stop]
+
+    def _select(self, column, indices):
+        column = column[:self._n]
+        if indices is None or isinstance(indices, slice):
+            return column if indices is None else column[indices]  # views
+        return column[np.asarray(indices, dtype=np.intp)]
+
+    def starts(self, indices=None):
+        """Start points (a point, or the left point of a range): a view for all books or a slice, else O(len(indices))."""
+        return self._select(self._start, indices)
+
+    def anchors(self, indices=None):
+        """One point per book: the point itself, or the midpoint of a skipped-book range."""
+        starts = self._select(self._start, indices)
+        is_range = self._select(self._kind, indices) == self.RANGE
+        if not is_range.any():
+            return starts
+        ends = self._select(self._end, indices)
+        return np.where(is_range[:, None], (starts + ends) / 2, starts)
+
+class SpatialIndex:
+    """
+    Sorted-x index plus a cKDTree over the anchors of a PositionStore.
+
+    Both are rebuilt lazily. Books appended since the last build form a contiguous
+    tail that queries scan with one vectorized pass, and books moved since then are
+    kept in a small set that is filtered out of the index results and scanned the
+    same way. Once tail plus moved books outgrow rebuild_fraction of the memory
+    (at least min_rebuild books), the next query rebuilds, so a sweep of appends
+    costs amortised O(log n) per book. 2D (pixel) positions are indexed with z = 0.
+    """
+
+    def __init__(self, store, rebuild_fraction=0.1, min_rebuild=64):
+        self.store = store
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self._built_n = 0
+        self._moved = set()
+        self._order = np.empty(0, dtype=np.intp)  # indexed books sorted by x
+        self._xs = np.empty(0)
+        self._tree = None
+        store.listener = self._on_write
+
+    def _on_write(self, i):
+        if i < self._built_n:
+            self._moved.add(i)
+
+    def _sync(self):
+        stale = len(self.store) - self._built_n + len(self._moved)
+        if stale > max(self.min_rebuild, self.rebuild_fraction * len(self.store)):
+            self.rebuild()
+
+    def rebuild(self):
+        anchors = np.nan_to_num(self.store.anchors())
+        self._order = np.argsort(anchors[:, 0], kind="stable")
+        self._xs = anchors[self._order, 0]
+        from scipy.spatial import cKDTree
+        self._tree = cKDTree(anchors) if len(anchors) else None
+        self._built_n = len(anchors)
+        self._moved.clear()
+
+    def _unindexed(self):
+        """(indices, anchors) of the books the index doesn't cover: the appended tail plus moved books."""
+        if self._built_n == len(self.store) and not self._moved:
+            return np.empty(0, dtype=np.intp), None
+        tail = np.arange(self._built_n, len(self.store), dtype=np.intp)
+        tail_anchors = self.store.anchors(slice(self._built_n, None))
+        if not self._moved:
+            return tail, np.nan_to_num(tail_anchors)
+        moved = np.fromiter(self._moved, dtype=np.intp, count=len(self._moved))
+        return (np.concatenate([tail, moved]),
+                np.nan_to_num(np.concatenate([tail_anchors, self.store.anchors(moved)])))
+
+    def _drop_moved(self, idxs, *others):
+        if not self._moved:
+            return (idxs,) + others
+        keep = ~np.isin(idxs, np.fromiter(self._moved, dtype=np.intp, count=len(self._moved)))
+        return (idxs[keep],) + tuple(o[keep] for o in others)
+
+    def query_range(self, x0, x1):
+        """Indices of books whose anchor x lies in [x0, x1], ordered by x."""
+        self._sync()
+        lo = np.searchsorted(self._xs, x0, side="left")
+        hi = np.searchsorted(self._xs, x1, side="right")
+        found, xs = self._drop_moved(self._order[lo:hi], self._xs[lo:hi])
+        extra, extra_anchors = self._unindexed()
+        if len(extra):
+            hit = (extra_anchors[:, 0] >= x0) & (extra_anchors[:, 0] <= x1)
+            found = np.concatenate([found, extra[hit]])
+            xs = np.concatenate([xs, extra_anchors[hit, 0]])
+            found = found[np.argsort(xs, kind="stable")]
+        return found
+
+    def query_nearest(self, point, k=1):
+        """(distances, indices) of the k books whose anchors are nearest to point, nearest first."""
+        self._sync()
+        point = np.asarray(point, dtype=float)
+        point = np.pad(point, (0, PositionStore.DIM - len(point)))
+        dists = np.empty(0)
+        idxs = np.empty(0, dtype=np.intp)
+        if self._tree is not None and self._tree.n:
+            # over-fetch so that dropping moved books still leaves k candidates
+            want = min(self._tree.n, k + len(self._moved))
+            dists, idxs = self._tree.query(point, k=want)
+            idxs, dists = self._drop_moved(np.atleast_1d(idxs), np.atleast_1d(dists))
+        extra, extra_anchors = self._unindexed()
+        if len(extra):
+            dists = np.concatenate([dists, np.linalg.norm(extra_anchors - point, axis=1)])
+            idxs = np.concatenate([idxs, extra])
+        best = np.argsort(dists, kind="stable")[:k]
+        return dists[best], idxs[best]
+
+def _image_hash(image):
+    """Content hash of an image array (shape and dtype included), as a hex string."""
+    image = np.ascontiguousarray(image)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.dtype.str}{image.shape}".encode("ascii"))
+    h.update(memoryview(image).cast("B"))
+    return h.hexdigest()
+
+class ImageStore:
+    """
+    Content-addressed store of the photos books were seen in, keyed by image id
+    (the content hash). Every distinct photo is kept once: interning a copy of a
+    stored photo returns the stored array. The same array object is recognised
+    without rehashing, so the many fails of one photo cost a single hash.
+
+    A photo may be a list or tuple of arrays such as [bgr, depth]: it is stored under
+    the composite id "bgr id+depth id" and its arrays under their own ids, each array
+    released once no photo holds it any more.
+    """
+
+    def __init__(self):
+        self._images = {}  # image id -> array
+        self._composites = {}  # composite id -> list/tuple of stored arrays
+        self._holders = {}  # array image id -> ids of the photos holding it (itself and/or composites)
+        self._by_object = {}  # id(stored array) -> image id
+
+    def __len__(self):
+        """Number of distinct arrays stored."""
+        return len(self._images)
+
+    def __contains__(self, image_id):
+        return image_id in self._images or image_id in self._composites
+
+    def __getitem__(self, image_id):
+        if image_id in self._composites:
+            return self._composites[image_id]
+        return self._images[image_id]
+
+    def __getstate__(self):
+        return {"images": self._images, "composites": self._composites, "holders": self._holders}
+
+    def __setstate__(self, state):
+        self._images = state["images"]
+        self._composites = state.get("composites", {})
+        self._holders = state.get("holders") or {image_id: {image_id} for image_id in self._images}
+        self._by_object = {id(image): image_id for image_id, image in self._images.items()}
+
+    @property
+    def nbytes(self):
+        return sum(image.nbytes for image in self._images.values())
+
+    def _hold(self, image_id, image, holder):
+        image = self._images.setdefault(image_id, image)
+        self._by_object[id(image)] = image_id
+        self._holders.setdefault(image_id, set()).add(holder)
+        return image
+
+    def _store(self, image_id, image, part_ids):
+        if isinstance(image, (list, tuple)):
+            parts = [self._hold(part_id, part, image_id) for part_id, part in zip(part_ids, image)]
+            return self._composites.setdefault(image_id, type(image)(parts))
+        return self._hold(image_id, image, image_id)
+
+    def adopt(self, image_id, image):
+        """Store image under an id computed earlier (e.g. read back from disk) without hashing it."""
+        part_ids = image_id.split("+") if isinstance(image, (list, tuple)) else None
+        return self._store(image_id, image, part_ids)
+
+    def intern(self, image):
+        """(image id, stored array) for an image array, or for a list/tuple of arrays such as [bgr, depth]."""
+        if isinstance(image, (list, tuple)):
+            part_ids = [self._by_object.get(id(part)) or _image_hash(part) for part in image]
+            image_id = "+".join(part_ids)
+            return image_id, self._store(image_id, image, part_ids)
+        image_id = self._by_object.get(id(image)) or _image_hash(image)
+        return image_id, self._store(image_id, image, None)
+
+    def discard(self, image_id):
+        """Drop a photo, and each of its arrays no other photo holds."""
+        composite = self._composites.pop(image_id, None)
+        part_ids = image_id.split("+") if composite is not None else [image_id]
+        for part_id in part_ids:
+            holders = self._holders.get(part_id)
+            if holders is None:
+                continue
+            holders.discard(image_id)
+            if not holders:
+                del self._holders[part_id]
+                image = self._images.pop(part_id, None)
+                if image is not None:
+                    self._by_object.pop(id(image), None)
 
 class BookMemory:
     def __init__(self, database=book_database):
-        self.book_positions = []  # list of np.array([x, y, z]). For skipped book fails, this is a list of the two points between which the book was skipped
+        self.book_positions = []  # PositionStore of np.array([x, y, z]). For skipped book fails, an entry is a list of the two points between which the book was skipped
         self.book_infos = []  # same-length list of book data (e.g., {"id": ..., "similarity": ..., "confidence": ...})
         self.book_img_info = [] # only for fails, same-length list (e.g. {"image": [bgr, depth], "cam_extr": ..., "mask": ...})
 
@@ -25,13 +353,99 @@ class BookMemory:
         self.window = [] # assumes we are moving generally left to right, indices in self.book_positions to look at
         self.book_database = database
         self._recent_indices = []  # Track indices of recently added books
+        self._id_index = {}  # _id_key(info['id']) -> index of the first book with that id
+        self.images = ImageStore()  # every photo once; book_img_info[i]["image_id"] refers into it
+        self._image_books = {}  # image id -> indices in book_img_info seen in that photo
 
     def __len__(self):
         return len(self.book_positions)
 
+    @property
+    def book_positions(self):
+        return self._positions
+
+    @book_positions.setter
+    def book_positions(self, positions):
+        self._positions = positions if isinstance(positions, PositionStore) else PositionStore(positions)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_spatial", None)  # rebuilt on demand
+        return state
+
+    def __setstate__(self, state):
+        # memories pickled before the id index / columnar positions existed
+        state = dict(state)
+        if "book_positions" in state:
+            state["_positions"] = PositionStore(state.pop("book_positions"))
+        self.__dict__.update(state)
+        if "_id_index" not in state:
+            self._rebuild_id_index()
+        if "images" not in state:
+            self._rebuild_image_index()
+
+    def _rebuild_id_index(self):
+        self._id_index = {}
+        for i, book in enumerate(self.book_infos):
+            self._id_index.setdefault(_id_key(book['id']), i)
+
+    def _index_image(self, idx, img_info):
+        """Intern img_info["image"] and record book idx under its image id."""
+        if "image" not in img_info:
+            return
+        image_id = img_info.get("image_id")
+        if image_id is not None:
+            img_info["image"] = self.images.adopt(image_id, img_info["image"])
+        else:
+            img_info["image_id"], img_info["image"] = self.images.intern(img_info["image"])
+        insort(self._image_books.setdefault(img_info["image_id"], []), idx)
+
+    def _unindex_image(self, idx, img_info):
+        image_id = img_info.get("image_id")
+        books = self._image_books.get(image_id)
+        if books is None:
+            return
+        books.remove(idx)
+        if not books:
+            del self._image_books[image_id]
+            self.images.discard(image_id)
+
+    def _rebuild_image_index(self):
+        self.images = ImageStore()
+        self._image_books = {}
+        for idx, img_info in enumerate(self.book_img_info):
+            self._index_image(idx, img_info)
+
+    def books_by_image(self):
+        """{image id: [sorted book indices seen in that photo]}, photos in order of first appearance."""
+        return self._image_books
+
+    def get_image(self, idx):
+        """The photo book idx was seen in."""
+        return self.images[self.book_img_info[idx]["image_id"]]
+
+    def find_book(self, book_id):
+        """Index of the book stored with this id (a single id or a list of candidates), or None."""
+        return self._id_index.get(_id_key(book_id))
+
+    def _spatial_index(self):
+        spatial = self.__dict__.get("_spatial")
+        if spatial is None or spatial.store is not self._positions:
+            spatial = self._spatial = SpatialIndex(self._positions)
+        return spatial
+
+    def query_range(self, x0, x1):
+        """Indices of known books whose x lies in [x0, x1] (skipped books by their midpoint), ordered by x."""
+        return self._spatial_index().query_range(x0, x1)
+
+    def query_nearest(self, point, k=1):
+        """(distances, indices) of the k known books nearest to a 2D or 3D point."""
+        return self._spatial_index().query_nearest(point, k)
+
     def resort_within_indices(self, indices):
-        window_positions = np.array(self.book_positions)[np.array(indices)]
-        sorted_within_window = np.argsort(window_positions[:, 0])
+        # only the window's x column is gathered; skipped-book ranges sort by their left point
+        window_x = self._positions.starts(indices)[:, 0]
+        sorted_within_window = np.argsort(window_x)
         return sorted_within_window
 
     def add_book(self, position, info, img_info=None):
@@ -47,23 +461,28 @@ class BookMemory:
             int: Index of the added book, or None if book was not added
         """
         # Check if we already have this book
-        for i, book in enumerate(self.book_infos):
-            if book['id'] == info['id']:
-                # Update existing book
-                self.book_positions[i] = position
-                self.book_infos[i].update(info)
-                if img_info:
-                    self.book_img_info[i] = img_info
-                self._recent_indices.append(i)
-                return i
+        key = _id_key(info['id'])
+        i = self._id_index.get(key)
+        if i is not None:
+            # Update existing book
+            self.book_positions[i] = position
+            self.book_infos[i].update(info)
+            if img_info:
+                self._unindex_image(i, self.book_img_info[i])
+                self._index_image(i, img_info)
+                self.book_img_info[i] = img_info
+            self._recent_indices.append(i)
+            return i
         
         # Add new book
         self.book_positions.append(position)
         info["nearby_window"] = self.window[:-1] # last element should always be the current index
         self.book_infos.append(info)
         if img_info is not None:
+            self._index_image(len(self.book_img_info), img_info)
             self.book_img_info.append(img_info)
         new_index = len(self.book_positions) - 1
+        self._id_index[key] = new_index
         self._recent_indices.append(new_index)
         return new_index
 
@@ -87,10 +506,10 @@ class BookMemory:
             return self.book_positions[idx], self.book_infos[idx]
 
     def plot_book_positions(self, indices=None, cam_position=None, robot_position=None):
-        positions = np.array(self.book_positions)
-        if indices is not None:
-            positions = positions[np.array(indices)]
-        else:
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d import Axes3D  # registers the '3d' projection
+        positions = self._positions.starts(indices)
+        if indices is None:
             indices = list(range(len(positions)))
 
         fig = plt.figure()
@@ -119,13 +538,203 @@ class BookMemory:
 
         plt.show()
 
-def load_from_file(filepath):
-    import pickle
+# on-disk session format, see save_to_dir
+FORMAT_NAME = "book_memory"
+FORMAT_VERSION = 1
+_BLOB_ALIGN = 64
+_SAVED = object()  # load_*'s default database: the one the memory was saved with
+
+def _encode_database(database):
+    """
+    meta.json form of a memory's catalog binding: "book_database", null, or
+    {"catalog": path} for a catalog read by load_catalog. Anything else (e.g. a catalog
+    built in memory) can't be reopened, so nothing is stored and loading falls back to
+    book_database.
+    """
+    if database is None:
+        return None
+    if database is book_database:
+        return "book_database"
+    source = getattr(database, "source", None)
+    return {"catalog": source} if source else _SAVED
+
+def _decode_database(meta):
+    database = meta.get("database", "book_database")
+    if database is None:
+        return None
+    if isinstance(database, dict) and "catalog" in database:
+        return load_catalog(database["catalog"])
+    return book_database
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Pickles written by the robot code refer to this module as book_utils.book_memory."""
+
+    def find_class(self, module, name):
+        if module in ("book_utils.book_memory", "book_memory"):
+            return getattr(sys.modules[__name__], name)
+        return super().find_class(module, name)
+
+def _encode_value(value, blobs):
+    """
+    JSON-safe form of an info value. If blobs is a dict, arrays are added to it
+    (id(array) -> (blob index, array), once per array object) and replaced by
+    {"__blob__": i}; otherwise they go inline.
+    """
+    if isinstance(value, np.ndarray):
+        if blobs is None:
+            return {"__ndarray__": value.tolist(), "dtype": value.dtype.str}
+        index, _ = blobs.setdefault(id(value), (len(blobs), value))
+        return {"__blob__": index}
+    if isinstance(value, np.generic):
+        return {"__scalar__": value.item(), "dtype": value.dtype.str}
+    if isinstance(value, dict):
+        return {str(k): _encode_value(v, blobs) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode_value(v, blobs) for v in value]}
+    if isinstance(value, list):
+        return [_encode_value(v, blobs) for v in value]
+    return value
+
+def _decode_value(value, blobs):
+    if isinstance(value, list):
+        return [_decode_value(v, blobs) for v in value]
+    if isinstance(value, dict):
+        if "__blob__" in value:
+            return blobs(value["__blob__"])
+        if "__ndarray__" in value:
+            return np.array(value["__ndarray__"], dtype=value["dtype"])
+        if "__scalar__" in value:
+            return np.dtype(value["dtype"]).type(value["__scalar__"])
+        if "__tuple__" in value:
+            return tuple(_decode_value(v, blobs) for v in value["__tuple__"])
+        return {k: _decode_value(v, blobs) for k, v in value.items()}
+    return value
+
+def save_to_dir(bm, dirpath):
+    """
+    Save a BookMemory as a directory that loads in milliseconds:
+
+        meta.json      format/version, infos, image infos and the blob offset table
+        positions.npy  structured array with the PositionStore columns
+        images.bin     every array from book_img_info (images, depths, masks),
+                       64-byte aligned, each stored once however many books share it
+                       (images are interned by content, see ImageStore)
+    """
+    os.makedirs(dirpath, exist_ok=True)
+    store = bm.book_positions
+    n = len(store)
+    positions = np.zeros(n, dtype=[("start", "f8", (PositionStore.DIM,)), ("end", "f8", (PositionStore.DIM,)),
+                                   ("kind", "u1"), ("ndim", "u1")])
+    state = store.__getstate__()
+    for name in positions.dtype.names:
+        positions[name] = state[name]
+    # every file is written aside and moved into place, meta.json last: a memory loaded
+    # from dirpath keeps reading the old images.bin through its memory map
+    tmp = {name: os.path.join(dirpath, name + ".tmp") for name in ("images.bin", "positions.npy", "meta.json")}
+    with open(tmp["positions.npy"], "wb") as f:
+        np.save(f, positions)
+
+    arrays = {}
+    img_infos = [_encode_value(img_info, arrays) for img_info in bm.book_img_info]
+    table = []
+    offset = 0
+    with open(tmp["images.bin"], "wb") as f:
+        for _, arr in arrays.values():
+            arr = np.ascontiguousarray(arr)
+            pad = -offset % _BLOB_ALIGN
+            f.write(b"\0" * pad)
+            offset += pad
+            table.append({"offset": offset, "shape": list(arr.shape), "dtype": arr.dtype.str})
+            f.write(arr.tobytes())
+            offset += arr.nbytes
+
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "n": n,
+        "out_of_view_thresh": bm.out_of_view_thresh,
+        "window": _encode_value(bm.window, None),
+        "recent_indices": _encode_value(bm._recent_indices, None),
+        "book_infos": [_encode_value(info, None) for info in bm.book_infos],
+        "book_img_info": img_infos,
+        "blobs": table,
+    }
+    database = _encode_database(bm.book_database)
+    if database is not _SAVED:
+        meta["database"] = database
+    with open(tmp["meta.json"], "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    for name, path in tmp.items():
+        os.replace(path, os.path.join(dirpath, name))
+
+def load_from_dir(dirpath, database=_SAVED):
+    """
+    Load a directory written by save_to_dir. Images are copy-on-write views into a
+    memory map of images.bin, so only the pages of images actually used are read.
+    The memory is bound to `database` if one is given (None included), else to the
+    catalog it was saved with (see _encode_database).
+    """
+    with open(os.path.join(dirpath, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_NAME or meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{dirpath}: unsupported format {meta.get('format')!r} version {meta.get('version')!r}")
+
+    table = meta["blobs"]
+    blob_path = os.path.join(dirpath, "images.bin")
+    mapped = np.memmap(blob_path, dtype=np.uint8, mode="c") if table and os.path.getsize(blob_path) else None
+    views = {}
+
+    def blob(i):
+        # one array object per blob, so books that shared an image still share it
+        if i not in views:
+            entry = table[i]
+            dtype = np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"], dtype=np.int64))
+            views[i] = np.ndarray(entry["shape"], dtype=dtype, buffer=mapped, offset=entry["offset"]) \
+                if count else np.empty(entry["shape"], dtype=dtype)
+        return views[i]
+
+    bm = BookMemory(database=_decode_database(meta) if database is _SAVED else database)
+    positions = np.load(os.path.join(dirpath, "positions.npy"))
+    store = PositionStore.__new__(PositionStore)
+    store.__setstate__({name: np.array(positions[name]) for name in positions.dtype.names})
+    bm.book_positions = store
+    bm.book_infos = [_decode_value(info, blob) for info in meta["book_infos"]]
+    bm.book_img_info = [_decode_value(img_info, blob) for img_info in meta["book_img_info"]]
+    bm.out_of_view_thresh = meta["out_of_view_thresh"]
+    bm.window = _decode_value(meta["window"], blob)
+    bm._recent_indices = _decode_value(meta["recent_indices"], blob)
+    bm._rebuild_id_index()
+    bm._rebuild_image_index()  # uses the saved image ids, so no image is read here
+    return bm
+
+def load_from_file(filepath, database=_SAVED):
+    """
+    Load a BookMemory from a save_to_dir directory or from a (legacy) pickle. Either
+    way it keeps the catalog it was saved with unless `database` is given.
+    """
+    if os.path.isdir(filepath):
+        return load_from_dir(filepath, database=database)
     with open(filepath, 'rb') as f:
-        return pickle.load(f)
+        bm = _LegacyUnpickler(f).load()
+    if database is not _SAVED:
+        bm.book_database = database
+    return bm
+
+def convert_pickle(pickle_path, dirpath):
+    """Convert a pickled BookMemory (e.g. fails.pkl) to the save_to_dir format."""
+    bm = load_from_file(pickle_path)
+    save_to_dir(bm, dirpath)
+    return bm
 
 
 if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "convert":
+        # python book_memory.py convert fails.pkl fails.bm
+        converted = convert_pickle(sys.argv[2], sys.argv[3])
+        print(f"Converted {len(converted)} books: {sys.argv[2]} -> {sys.argv[3]}")
+        sys.exit(0)
+
     bm = load_from_file(os.path.join(os.path.dirname(__file__), "..", "found_books.pkl"))
     print("Found books:", len(bm))
     print(bm.book_infos)   
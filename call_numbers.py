@@ -0,0 +1,75 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# the whole LC structure in one pass: class letters, class number, cutters, then the rest
+# (year, volume, copy...). A cutter is a letter directly followed by digits, so "V.18"
+# or "NO.1" fall through to the tail.
+_LC = re.compile(r"""
+    ^(?P<letters>[A-Z]{1,3})\s*
+    (?P<number>\d+)(?:\.(?P<decimal>\d+))?\s*
+    (?P<cutters>(?:\.?\s*[A-Z]\d+\b\s*)*)
+    (?P<tail>.*)$
+""", re.VERBOSE)
+_CUTTER = re.compile(r"([A-Z])(\d+)")
+_TAIL_TOKEN = re.compile(r"\d+|[A-Z]+")
+
+CallNumber = namedtuple("CallNumber", ["letters", "number", "decimal", "cutters", "tail"])
+
+
+def normalize_call_number(call_number):
+    """Upper-case and collapse whitespace, e.g. 'DS793 .K7 K86, V.1-2   ' -> 'DS793 .K7 K86, V.1-2'."""
+    return " ".join(str(call_number).upper().split())
+
+def parse_call_number(call_number):
+    """
+    Split an LC call number into its parts, or return None if it isn't one (e.g. 'No call 3').
+
+    >>> parse_call_number("DS793 .K7 K86, V.1-2   ")
+    CallNumber(letters='DS', number=793, decimal='', cutters=(('K', '7'), ('K', '86')), tail=('V', 1, 2))
+    """
+    m = _LC.match(normalize_call_number(call_number))
+    if m is None:
+        return None
+    tail = tuple(int(t) if t.isdigit() else t for t in _TAIL_TOKEN.findall(m.group("tail")))
+    return CallNumber(
+        letters=m.group("letters"),
+        number=int(m.group("number")),
+        decimal=m.group("decimal") or "",
+        cutters=tuple(_CUTTER.findall(m.group("cutters"))),
+        tail=tail,
+    )
+
+@lru_cache(maxsize=1 << 18)
+def call_number_key(call_number):
+    """
+    Packed bytes sort key: comparing keys with < gives LC shelf order.
+
+    Every part is encoded so that plain byte comparison does the right thing: class
+    letters padded to 3 bytes, the class number as a 4-byte int, decimals and cutter
+    digits as digit strings (a decimal fraction sorts lexicographically, so .K847 < .K85),
+    and tail numbers length-prefixed (V.2 < V.10). Each list of parts ends with a 0x00
+    byte, so a call number sorts before any longer one it is a prefix of. Non-LC call
+    numbers sort after all LC ones, by their normalized text.
+    """
+    cn = normalize_call_number(call_number)
+    m = _LC.match(cn)
+    if m is None:
+        return b"\x01" + cn.encode("utf-8")
+    letters, number, decimal, cutters, tail = m.groups()
+
+    # every character below is ASCII (or a \x00-\x02 separator), so the key is
+    # assembled as one str and encoded once
+    parts = ["\x00", letters.ljust(3, "\x00"), "", decimal or "", "\x00"]
+    parts[2] = min(int(number), 0xFFFFFFFF).to_bytes(4, "big").decode("latin-1")
+    for letter, digits in _CUTTER.findall(cutters):
+        parts.append("\x01" + letter + digits + "\x00")
+    parts.append("\x00")
+    for token in _TAIL_TOKEN.findall(tail):
+        if token.isdigit():
+            token = token.lstrip("0") or "0"
+            parts.append("\x01" + chr(len(token)) + token)
+        else:
+            parts.append("\x02" + token + "\x00")
+    parts.append("\x00")
+    return "".join(parts).encode("latin-1")
@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+from call_numbers import call_number_key, normalize_call_number
+
+
+class Catalog(Mapping):
+    """
+    The library catalog, kept in shelf (call-number) order.
+
+    Behaves like the book_database dict (id -> {"call_number", "alt_title", ...}),
+    but ids are ints (string ids such as "3" are accepted too), iteration follows
+    shelf order, and neighbour/range queries are O(log n) via bisect on the packed
+    call-number keys (see call_numbers.call_number_key), computed once per record.
+    """
+
+    def __init__(self, records):
+        entries = sorted(
+            ((call_number_key(rec.get("call_number", "")), int(db_id), rec) for db_id, rec in records.items()),
+            key=lambda e: (e[0], e[1]),
+        )
+        self._keys = [key for key, _, _ in entries]
+        self._ids = [db_id for _, db_id, _ in entries]
+        self._records = {db_id: rec for _, db_id, rec in entries}
+        self._position = {db_id: pos for pos, db_id in enumerate(self._ids)}
+        # packed sort key -> dense shelf rank (books sharing a call number share a rank)
+        self._rank = {}
+        for key in self._keys:
+            self._rank.setdefault(key, len(self._rank))
+
+        # normalized call number -> id; for duplicate call numbers the first on the shelf wins
+        self._by_call_number = {}
+        for db_id in self._ids:
+            cn = normalize_call_number(self._records[db_id].get("call_number", ""))
+            self._by_call_number.setdefault(cn, db_id)
+
+        # built on first use: only the labelling UI needs them
+        self._labels = None  # id -> "call_number, alt_title"
+        self._prefix_index = None  # sorted (folded call number or title, shelf position)
+        self.source = None  # file it was loaded from by load_catalog, if any
+
+    @classmethod
+    def from_json(cls, filepath):
+        """Load a catalog from a JSON file shaped like subset_book_database.json."""
+        with open(filepath, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_sqlite(cls, filepath, table="books"):
+        """Load a catalog from an SQLite table with an integer `id` column plus record columns."""
+        con = sqlite3.connect(filepath)
+        try:
+            con.row_factory = sqlite3.Row
+            rows = con.execute(f'SELECT * FROM "{table}"').fetchall()
+        finally:
+            con.close()
+        return cls({row["id"]: {k: row[k] for k in row.keys() if k != "id"} for row in rows})
+
+    def to_sqlite(self, filepath, table="books"):
+        """Write the catalog to an SQLite table readable by from_sqlite."""
+        columns = sorted({k for rec in self._records.values() for k in rec})
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        con = sqlite3.connect(filepath)
+        try:
+            col_defs = "".join(f', "{c}" TEXT' for c in columns)
+            con.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY{col_defs})')
+            con.executemany(
+                f'INSERT OR REPLACE INTO "{table}" (id, {quoted}) VALUES ({placeholders})',
+                [(db_id, *(rec.get(c) for c in columns)) for db_id, rec in self.items()],
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    # Mapping interface
+    def __getitem__(self, db_id):
+        return self._records[int(db_id)]
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, db_id):
+        try:
+            return int(db_id) in self._records
+        except (TypeError, ValueError):
+            return False
+
+    def get(self, db_id, default=None):
+        try:
+            return self._records.get(int(db_id), default)
+        except (TypeError, ValueError):
+            return default
+
+    # lookups
+    @property
+    def ids(self):
+        """All ids in shelf order."""
+        return list(self._ids)
+
+    def id_for_call_number(self, call_number):
+        """Id of the book with this call number (spacing/case insensitive), or None."""
+        return self._by_call_number.get(normalize_call_number(call_number))
+
+    def shelf_position(self, db_id):
+        """Index of the book in shelf order."""
+        return self._position[int(db_id)]
+
+    def locate(self, call_number):
+        """Shelf index at which a book with this call number would be shelved."""
+        return bisect_left(self._keys, call_number_key(call_number))
+
+    def shelf_codes(self, call_numbers):
+        """
+        Integer codes for a sequence of call numbers, for aligning with WagnerFischer.
+
+        Call numbers that parse to the same key get the same code (their shelf rank),
+        so equality checks compare ints rather than re-normalizing strings. Call
+        numbers not in the catalog get negative codes, equal only to each other.
+        """
+        unknown = {}
+        codes = []
+        for cn in call_numbers:
+            key = call_number_key(cn)
+            code = self._rank.get(key)
+            if code is None:
+                code = unknown.setdefault(key, -1 - len(unknown))
+            codes.append(code)
+        return codes
+
+    # labels and search
+    def label(self, db_id):
+        """The display label "call_number, alt_title" of a book, formatted once per catalog."""
+        if self._labels is None:
+            self._labels = {
+                db_id: f"{rec.get('call_number', '')}, {rec.get('alt_title', '')}"
+                for db_id, rec in self._records.items()
+                if rec.get("call_number") or rec.get("alt_title")
+            }
+        return self._labels.get(int(db_id))
+
+    def search(self, query, k=20):
+        """
+        Ids of up to k books whose call number or alt_title starts with query, ignoring
+        case and whitespace ("ds793 .k7 k84" finds "DS793.K7 K8446 1995"), in match order.
+        """
+        q = _fold(query)
+        if not q:
+            return []
+        if self._prefix_index is None:
+            entries = []
+            for pos, db_id in enumerate(self._ids):
+                rec = self._records[db_id]
+                for field in ("call_number", "alt_title"):
+                    text = _fold(rec.get(field) or "")
+                    if text:
+                        entries.append((text, pos))
+            entries.sort()
+            self._prefix_index = ([text for text, _ in entries], [pos for _, pos in entries])
+        texts, positions = self._prefix_index
+
+        found = {}
+        for i in range(bisect_left(texts, q), len(texts)):
+            if not texts[i].startswith(q) or len(found) >= k:
+                break
+            found.setdefault(self._ids[positions[i]], None)
+        return list(found)
+
+    def _bound(self, ref, side):
+        """Shelf index for a reference given as a database id or a call number string."""
+        if isinstance(ref, str) and _int_or_none(ref) is None:  # a call number
+            key = call_number_key(ref)
+            return bisect_left(self._keys, key) if side == "left" else bisect_right(self._keys, key)
+        pos = self.shelf_position(ref)
+        return pos if side == "left" else pos + 1
+
+    def neighbours(self, db_id, k=1):
+        """The (up to) k ids shelved immediately before and after db_id, as (before, after)."""
+        pos = self.shelf_position(db_id)
+        return self._ids[max(0, pos - k):pos], self._ids[pos + 1:pos + 1 + k]
+
+    def shelved_between(self, lo, hi, inclusive=False):
+        """
+        Ids shelved between lo and hi (database ids or call numbers), in shelf order.
+        Endpoints are excluded unless inclusive is True.
+        """
+        if inclusive:
+            start, stop = self._bound(lo, "left"), self._bound(hi, "right")
+        else:
+            start, stop = self._bound(lo, "right"), self._bound(hi, "left")
+        return self._ids[start:stop]
+
+
+def _int_or_none(value):
+    """int(value), or None if it isn't an integer id."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fold(text):
+    """Case- and whitespace-insensitive form of a call number or title, for prefix search."""
+    return "".join(str(text).split()).casefold()
+
+
+def load_catalog(filepath):
+    """Load a Catalog from a .json file or an SQLite database (.db, .sqlite, .sqlite3)."""
+    if str(filepath).lower().endswith((".db", ".sqlite", ".sqlite3")):
+        catalog = Catalog.from_sqlite(filepath)
+    else:
+        catalog = Catalog.from_json(filepath)
+    catalog.source = os.path.abspath(filepath)
+    return catalog
@@ -1,9 +1,19 @@
+import os
+
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# below this many DP cells the numpy setup cost outweighs the vectorized fill
+_VECTORIZE_MIN_CELLS = 256
+
+
 def _zeros(n_rows, n_cols):
     """Create a 2D list of zeros with dimensions (n_rows x n_cols)."""
     return [[0 for _ in range(n_cols)] for _ in range(n_rows)]
 
-def WagnerFischer(A, B, insertion=1, deletion=1, substitution=1):
-    """Generalized Wagner-Fischer for arbitrary sequences (not just strings)."""
+def _wagner_fischer_python(A, B, insertion=1, deletion=1, substitution=1):
+    """Reference pure-Python Wagner-Fischer, used for tiny or unhashable inputs."""
     n_A = len(A)
     n_B = len(B)
 
@@ -27,44 +37,600 @@ def WagnerFischer(A, B, insertion=1, deletion=1, substitution=1):
                     D[i][j] + substitution      # substitute
                 )
 
-    # Traceback
-    aligned_A = list(A)
-    aligned_B = list(B)
-    changes = []
+    return _traceback(D, A, B)
+
+def _encode(A, B):
+    """Map the (hashable) elements of A and B onto shared integer codes."""
+    codes = {}
+    a = np.fromiter((codes.setdefault(x, len(codes)) for x in A), dtype=np.int64, count=len(A))
+    b = np.fromiter((codes.setdefault(x, len(codes)) for x in B), dtype=np.int64, count=len(B))
+    return a, b
+
+def _cost_dtype(*costs):
+    """int64 when every cost is an integer, float64 otherwise."""
+    if all(isinstance(c, (int, np.integer)) for c in costs):
+        return np.int64
+    return np.float64
+
+def _cost_matrix(n_A, n_B, insertion, deletion, substitution):
+    """Allocate the DP matrix with initialized edges and an 'unreached' fill value."""
+    dtype = _cost_dtype(insertion, deletion, substitution)
+    if dtype is np.int64:
+        # large enough to never win a min(), small enough to never overflow
+        unreached = np.iinfo(np.int64).max // 4
+    else:
+        unreached = np.inf
+    D = np.full((n_A + 1, n_B + 1), unreached, dtype=dtype)
+    D[:, 0] = np.arange(n_A + 1) * deletion
+    D[0, :] = np.arange(n_B + 1) * insertion
+    return D
+
+def _fill_wavefront(D, a, b, insertion, deletion, substitution, k=None):
+    """
+    Fill D one anti-diagonal (i + j = d) at a time.
+
+    Every cell on an anti-diagonal only depends on the two previous ones, so each
+    diagonal is a single vectorized update. In the flattened matrix the cells of
+    an anti-diagonal (and their left/up/diagonal neighbours) are strided slices
+    with step row_width - 1, so no index arrays are needed. D may be a reused
+    buffer wider than len(b) + 1; only its first len(b) + 1 columns are written.
+    D and b may also carry leading batch axes, filling many matrices at once.
+    If k is given, only cells with |i - j| <= k are filled (Ukkonen band).
+    """
+    n_A, n_B = len(a), b.shape[-1]
+    stride = D.shape[-1]
+    step = stride - 1
+    flat = D.reshape(D.shape[:-2] + (-1,))
+    for d in range(2, n_A + n_B + 1):
+        i0 = max(1, d - n_B)
+        i1 = min(n_A, d - 1)
+        if k is not None:
+            i0 = max(i0, (d - k + 1) // 2)
+            i1 = min(i1, (d + k) // 2)
+        if i0 > i1:
+            continue
+        start = i0 * stride + (d - i0)
+        stop = i1 * stride + (d - i1) + 1
+        cells = np.s_[..., start:stop:step]
+        left = flat[..., start - 1:stop - 1:step]
+        up = flat[..., start - stride:stop - stride:step]
+        diag = flat[..., start - stride - 1:stop - stride - 1:step]
 
-    i, j = n_A, n_B
+        # A[i-1] for i in [i0, i1] against B[j-1] for j = d - i (descending)
+        match = a[i0 - 1:i1] == b[..., d - i1 - 1:d - i0][..., ::-1]
+        best = np.minimum(np.minimum(left + insertion, up + deletion), diag + substitution)
+        flat[cells] = np.where(match, diag, best)
+    return D
+
+def _traceback(D, A, B, limit=None):
+    """
+    Walk D back from the bottom-right corner, building the aligned sequences in one pass.
+    Tie-breaking matches the original list-insert traceback exactly.
+    Returns None if limit is given and any cell read along the way exceeds it.
+    """
+    ops = []
+    i, j = len(A), len(B)
     while i > 0 and j > 0:
         s_cost = D[i][j]
         d_cost = D[i-1][j]
         i_cost = D[i][j-1]
+        if limit is not None and max(s_cost, d_cost, i_cost) > limit:
+            return None
 
         if s_cost <= d_cost and s_cost <= i_cost:
             if A[i-1] == B[j-1]:
-                changes.append('=')
+                ops.append('=')
             else:
-                changes.append('*')
+                ops.append('*')
             i -= 1
             j -= 1
         elif d_cost < i_cost:
-            changes.append('v')
-            aligned_B.insert(j, '*')  # mark missing element in B
+            ops.append('v')
             i -= 1
         else:
-            changes.append('^')
-            aligned_A.insert(i, '*')  # mark missing element in A
+            ops.append('^')
             j -= 1
 
     # Remaining characters if any
-    while i > 0:
-        changes.append('v')
-        aligned_B.insert(0, '*')
-        i -= 1
-    while j > 0:
-        changes.append('^')
-        aligned_A.insert(0, '*')
-        j -= 1
+    ops.extend('v' * i)
+    ops.extend('^' * j)
+    ops.reverse()
+    return _alignment(ops, A, B)
+
+def _alignment(ops, A, B):
+    """(aligned_A, aligned_B, changes) for a forward list of '=', '*', 'v', '^' ops."""
+    aligned_A = []
+    aligned_B = []
+    i = j = 0
+    for op in ops:
+        if op == 'v':
+            aligned_A.append(A[i])
+            aligned_B.append('*')  # mark missing element in B
+            i += 1
+        elif op == '^':
+            aligned_A.append('*')  # mark missing element in A
+            aligned_B.append(B[j])
+            j += 1
+        else:
+            aligned_A.append(A[i])
+            aligned_B.append(B[j])
+            i += 1
+            j += 1
+
+    return aligned_A, aligned_B, ''.join(ops)
+
+def WagnerFischer(A, B, insertion=1, deletion=1, substitution=1, k=None):
+    """
+    Generalized Wagner-Fischer for arbitrary sequences (not just strings).
+
+    The matrix is filled with a numpy anti-diagonal wavefront. If a band width k is
+    given, only cells within k of the main diagonal are computed; if the traceback
+    would have to read a cell the band cannot vouch for, k is doubled and the fill
+    repeated (Ukkonen), so the output is always identical to the unbanded alignment.
+    Returns (aligned_A, aligned_B, changes).
+    """
+    n_A = len(A)
+    n_B = len(B)
+    if n_A * n_B < _VECTORIZE_MIN_CELLS:
+        return _wagner_fischer_python(A, B, insertion, deletion, substitution)
+    try:
+        a, b = _encode(A, B)
+    except TypeError:  # unhashable elements, e.g. lists of candidate ids
+        return _wagner_fischer_python(A, B, insertion, deletion, substitution)
+
+    gap = min(insertion, deletion)
+    if min(insertion, deletion, substitution) < 0 or gap == 0:
+        k = None  # the band bound below needs strictly positive gap costs
+    while True:
+        if k is not None and k >= max(n_A, n_B):
+            k = None
+        D = _cost_matrix(n_A, n_B, insertion, deletion, substitution)
+        _fill_wavefront(D, a, b, insertion, deletion, substitution, k)
+        if k is None:
+            return _traceback(D, A, B)
+        # a cell with |i - j| > k costs at least (k + 1) * gap, so every banded cell
+        # worth at most k * gap is exact; if the traceback only reads such cells it
+        # makes exactly the same choices as the unbanded one
+        result = _traceback(D, A, B, limit=k * gap)
+        if result is not None:
+            return result
+        k = max(1, 2 * k)
+
+def _distance_rows(A, B, insertion, deletion, substitution, max_cost=None):
+    """
+    Edit distance keeping only two rolling rows of length min(n, m) + 1.
+
+    Each row is filled with numpy: the up/diagonal candidates are elementwise, and
+    the left-to-right insertion chain D[j] = min(t[j], D[j-1] + insertion) is a
+    prefix minimum of t[j] - j * insertion. (For non-negative costs a match is never
+    worse than a gap, so this equals the match-is-free recurrence in WagnerFischer.)
+    """
+    if len(B) > len(A):
+        # transposing swaps the roles of insertion and deletion
+        A, B = B, A
+        insertion, deletion = deletion, insertion
+    n_A, n_B = len(A), len(B)
+    gap = min(insertion, deletion)
+    if max_cost is not None and (n_A - n_B) * gap > max_cost:
+        return None
+
+    try:
+        a, b = _encode(A, B)
+        same = None
+    except TypeError:  # unhashable elements, compare pairwise instead
+        a, b = A, B
+        same = lambda x: np.fromiter((x == y for y in B), dtype=bool, count=n_B)
+
+    steps = np.arange(n_B + 1)
+    ramp = steps * insertion
+    remaining_B = n_B - steps
+    prev = ramp.astype(_cost_dtype(insertion, deletion, substitution))
+    for i in range(n_A):
+        match = (b == a[i]) if same is None else same(a[i])
+        up = prev[1:] + deletion
+        diag = prev[:-1]
+        t = np.empty_like(prev)
+        t[0] = prev[0] + deletion
+        t[1:] = np.where(match, diag, np.minimum(up, diag + substitution))
+        cur = np.minimum.accumulate(t - ramp) + ramp
+        if max_cost is not None:
+            # any path to the corner crosses this row, then needs at least
+            # |rows left - columns left| gaps
+            bound = cur + np.abs((n_A - i - 1) - remaining_B) * gap
+            if bound.min() > max_cost:
+                return None
+        prev = cur
+
+    distance = prev[-1].item()
+    if max_cost is not None and distance > max_cost:
+        return None
+    return distance
+
+def _distance_bits(A, B, max_cost=None):
+    """
+    Unit-cost edit distance with the Myers/Hyyro bit-parallel algorithm.
+
+    The longer sequence is the pattern: every distinct element gets a bitmask of the
+    positions where it occurs (Python ints, so any length works), and each element of
+    the shorter sequence then advances a whole DP column with a handful of big-int ops.
+    """
+    if len(B) > len(A):
+        A, B = B, A
+    n_A, n_B = len(A), len(B)
+    if max_cost is not None and n_A - n_B > max_cost:
+        return None
+    if n_A == 0:
+        return n_B
+
+    peq = {}
+    for pos, x in enumerate(A):
+        peq[x] = peq.get(x, 0) | (1 << pos)
+
+    full = (1 << n_A) - 1
+    last = 1 << (n_A - 1)
+    pv, mv = full, 0
+    score = n_A
+    for j, y in enumerate(B):
+        eq = peq.get(y, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        # the bottom row changes by at most one per remaining column
+        if max_cost is not None and score - (n_B - j - 1) > max_cost:
+            return None
+
+    if max_cost is not None and score > max_cost:
+        return None
+    return score
+
+def WagnerFischer_distance(A, B, insertion=1, deletion=1, substitution=1, max_cost=None, bit_parallel=None):
+    """
+    Edit cost between A and B without building the matrix or the traceback.
+
+    Uses O(min(n, m)) memory. For unit costs and hashable elements the bit-parallel
+    algorithm is used (bit_parallel=None picks it automatically, False disables it).
+    If max_cost is given, returns None as soon as the cost is known to exceed it.
+    """
+    unit = insertion == deletion == substitution == 1
+    if bit_parallel and not unit:
+        raise ValueError("bit-parallel distance needs unit insertion/deletion/substitution costs")
+    if bit_parallel is not False and unit:
+        try:
+            return _distance_bits(A, B, max_cost)
+        except TypeError:  # unhashable elements
+            if bit_parallel:
+                raise
+    return _distance_rows(A, B, insertion, deletion, substitution, max_cost)
+
+def _batch_in_process(A, Bs, insertion, deletion, substitution, traceback, chunksize):
+    """
+    WagnerFischer_batch body for a single process.
+
+    Bs are padded to a common length and filled chunksize at a time as one
+    (chunk, n_A + 1, width + 1) stack, reusing the same buffer for every chunk.
+    Padding never matches and sits to the right of each real B, so it cannot
+    change any cell a real B reads.
+    """
+    n_A = len(A)
+    distances = []
+    alignments = [] if traceback else None
+    try:
+        codes = {}
+        a = np.fromiter((codes.setdefault(x, len(codes)) for x in A), dtype=np.int64, count=n_A)
+        # elements that never occur in A can't match anything, so they share code -1
+        encoded = [np.fromiter((codes.get(x, -1) for x in B), dtype=np.int64, count=len(B)) for B in Bs]
+    except TypeError:  # unhashable elements
+        for B in Bs:
+            distances.append(WagnerFischer_distance(A, B, insertion, deletion, substitution, bit_parallel=False))
+            if traceback:
+                alignments.append(_wagner_fischer_python(A, B, insertion, deletion, substitution))
+        return distances, alignments
+
+    width = max((len(B) for B in Bs), default=0)
+    chunksize = max(1, min(chunksize, len(Bs)))
+    # edges only depend on A, so they are written once; every interior cell
+    # is overwritten by each chunk's own fill
+    edges = _cost_matrix(n_A, width, insertion, deletion, substitution)
+    buffer = np.broadcast_to(edges, (chunksize,) + edges.shape).copy()
+    padded = np.full((chunksize, width), -2, dtype=np.int64)
+
+    for s in range(0, len(Bs), chunksize):
+        chunk = encoded[s:s + chunksize]
+        D = buffer[:len(chunk)]
+        b = padded[:len(chunk)]
+        b.fill(-2)
+        for row, codes_B in zip(b, chunk):
+            row[:len(codes_B)] = codes_B
+        _fill_wavefront(D, a, b, insertion, deletion, substitution)
+        for D_B, B in zip(D, Bs[s:s + chunksize]):
+            distances.append(D_B[n_A, len(B)].item())
+            if traceback:
+                alignments.append(_traceback(D_B, A, B))
+    return distances, alignments
+
+def WagnerFischer_batch(A, Bs, insertion=1, deletion=1, substitution=1, traceback=False,
+                        parallel=False, max_workers=None, chunksize=64):
+    """
+    Align one observed sequence A against many candidate sequences Bs in one call.
+
+    Up to chunksize candidates are filled together in one preallocated buffer
+    that is reused for the whole batch. Returns the list of edit costs, or
+    (costs, alignments) if traceback is True, where each alignment is the same
+    (aligned_A, aligned_B, changes) tuple WagnerFischer returns.
+    With parallel=True, the chunks are spread over a ProcessPoolExecutor(max_workers)
+    instead, so elements must be picklable.
+    """
+    Bs = list(Bs)
+    if parallel and len(Bs) > chunksize:
+        chunks = [Bs[s:s + chunksize] for s in range(0, len(Bs), chunksize)]
+        distances = []
+        alignments = [] if traceback else None
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_batch_in_process, A, chunk, insertion, deletion, substitution, traceback, chunksize)
+                for chunk in chunks
+            ]
+            for future in futures:
+                chunk_distances, chunk_alignments = future.result()
+                distances.extend(chunk_distances)
+                if traceback:
+                    alignments.extend(chunk_alignments)
+    else:
+        distances, alignments = _batch_in_process(A, Bs, insertion, deletion, substitution, traceback, chunksize)
+
+    if traceback:
+        return distances, alignments
+    return distances
+
+def _last_row(a, b, insertion, deletion, substitution, free_start=False):
+    """
+    Bottom row of the DP matrix for encoded a against b, one numpy row at a time.
+    With free_start the top row is all zeros, i.e. A may start anywhere in B.
+    """
+    ramp = np.arange(len(b) + 1) * insertion
+    dtype = _cost_dtype(insertion, deletion, substitution)
+    prev = np.zeros(len(b) + 1, dtype=dtype) if free_start else ramp.astype(dtype)
+    for x in a:
+        prev = _next_row(prev, x, b, ramp, deletion, substitution)
+    return prev
+
+def _next_row(prev, x, b, ramp, deletion, substitution):
+    """The DP row for one more (encoded) element x of A, from the row above it."""
+    t = np.empty_like(prev)
+    t[0] = prev[0] + deletion
+    t[1:] = np.where(b == x, prev[:-1], np.minimum(prev[1:] + deletion, prev[:-1] + substitution))
+    return np.minimum.accumulate(t - ramp) + ramp
+
+def _semiglobal_traceback(A, B, a, b, last, insertion, deletion, substitution):
+    """WagnerFischer_semiglobal's result, given the free-start last row of encoded a against b."""
+    end = int(np.argmin(last))
+    cost = last[end].item()
+
+    # the window can't be longer than n plus however many insertions cost allows
+    longest = len(A) + (int(cost // insertion) if insertion > 0 else end)
+    lo = max(0, end - longest)
+    back = _last_row(a[::-1], b[lo:end][::-1], insertion, deletion, substitution)
+    offset = end - int(np.flatnonzero(back == cost)[0])
+
+    aligned_A, aligned_B, changes = WagnerFischer(A, B[offset:end], insertion, deletion, substitution)
+    return offset, cost, aligned_A, aligned_B, changes
+
+def WagnerFischer_semiglobal(A, B, insertion=1, deletion=1, substitution=1):
+    """
+    Find where A sits inside a much longer B (e.g. a shelf scan inside the
+    call-number-ordered catalog ids), with gaps before and after A in B free.
+
+    One O(n * m) pass over rolling rows finds the best end position in B; a short
+    reverse pass over at most n + cost / insertion elements recovers the start.
+    Ties go to the leftmost end and then the shortest window. Elements must be hashable.
+    Returns (offset, cost, aligned_A, aligned_B, changes), where the alignment is
+    WagnerFischer(A, B[offset:offset + consumed]).
+    """
+    a, b = _encode(A, B)
+    last = _last_row(a, b, insertion, deletion, substitution, free_start=True)
+    return _semiglobal_traceback(A, B, a, b, last, insertion, deletion, substitution)
+
+class IncrementalAligner:
+    """
+    Alignment of an observed sequence A that grows (and slides) one element at a time,
+    e.g. the books of BookMemory.window during a sweep, against a fixed B.
+
+    Only the last DP row is kept: append(x) computes the next row from it in one O(m)
+    numpy pass instead of realigning all of A. Dropping elements from the front
+    (popleft, or sync to the new window) recomputes the rows of what is left, so with
+    a bounded window every new book costs O(window * m), however long the sweep.
+    With free_start (the default) A may start anywhere in B and align() matches
+    WagnerFischer_semiglobal(A, B); otherwise cost() and align() match WagnerFischer(A, B).
+    Elements must be hashable.
+    """
+
+    def __init__(self, B, insertion=1, deletion=1, substitution=1, free_start=True, max_len=None):
+        self.B = list(B)
+        self.insertion, self.deletion, self.substitution = insertion, deletion, substitution
+        self.free_start = free_start
+        self.max_len = max_len  # if set, append() drops the oldest elements beyond this many
+        self.A = deque()
+        self._codes = {}
+        self._b = np.fromiter((self._codes.setdefault(x, len(self._codes)) for x in self.B),
+                              dtype=np.int64, count=len(self.B))
+        self._a = deque()
+        self._ramp = np.arange(len(self.B) + 1) * insertion
+        dtype = _cost_dtype(insertion, deletion, substitution)
+        self._top = np.zeros(len(self.B) + 1, dtype=dtype) if free_start else self._ramp.astype(dtype)
+        self._row = self._top
+
+    def __len__(self):
+        return len(self.A)
+
+    def append(self, x):
+        self.A.append(x)
+        self._a.append(self._codes.get(x, -1))  # elements not in B never match
+        self._row = _next_row(self._row, self._a[-1], self._b, self._ramp, self.deletion, self.substitution)
+        if self.max_len is not None and len(self.A) > self.max_len:
+            self.popleft(len(self.A) - self.max_len)
+
+    def extend(self, xs):
+        for x in xs:
+            self.append(x)
+
+    def popleft(self, k=1):
+        """Drops the k oldest elements of A (recomputing the row for the rest)."""
+        for _ in range(min(k, len(self.A))):
+            self.A.popleft()
+            self._a.popleft()
+        self._row = self._top
+        for x in self._a:
+            self._row = _next_row(self._row, x, self._b, self._ramp, self.deletion, self.substitution)
+
+    def sync(self, window):
+        """
+        Makes A equal to window, reusing the current row when window only adds elements
+        after A, or drops some from its front first (recomputing once), as a sliding window does.
+        """
+        window = list(window)
+        current = list(self.A)
+        for k in range(len(current) + 1):
+            kept = current[k:]
+            if window[:len(kept)] == kept:
+                break
+        if k:
+            self.popleft(k)
+        self.extend(window[len(current) - k:])
+
+    def cost(self):
+        """Cost of the current alignment: the best end anywhere in B with free_start, else A against all of B."""
+        return (self._row.min() if self.free_start else self._row[-1]).item()
+
+    def align(self):
+        """
+        (offset, cost, aligned_A, aligned_B, changes) as WagnerFischer_semiglobal(A, B) returns
+        with free_start; otherwise (aligned_A, aligned_B, changes) as WagnerFischer(A, B).
+        """
+        A = list(self.A)
+        if not self.free_start:
+            return WagnerFischer(A, self.B, self.insertion, self.deletion, self.substitution)
+        a = np.fromiter(self._a, dtype=np.int64, count=len(self._a))
+        return _semiglobal_traceback(A, self.B, a, self._b, self._row, self.insertion, self.deletion, self.substitution)
+
+# rows below which the linear-space traceback fills its block as a small matrix
+_LINEAR_BLOCK_ROWS = 64
+
+def _walk_block(a, b, top, r0, r1, j, ops, insertion, deletion, substitution):
+    """
+    _traceback's walk from cell (r1, j) up to row r0, with D[r0] given as top. The rows
+    r0..r1 are filled over columns 0..j only (the walk never reads further right).
+    Appends the ops (last first) and returns the column at which the walk reached row r0.
+    """
+    ramp = np.arange(j + 1) * insertion
+    rows = [top[:j + 1]]
+    for x in a[r0:r1]:
+        rows.append(_next_row(rows[-1], x, b[:j], ramp, deletion, substitution))
+    D = [row.tolist() for row in rows]
+    i = r1
+    while i > r0 and j > 0:
+        s_cost = D[i - r0][j]
+        d_cost = D[i - r0 - 1][j]
+        i_cost = D[i - r0][j - 1]
+        if s_cost <= d_cost and s_cost <= i_cost:
+            ops.append('=' if a[i - 1] == b[j - 1] else '*')
+            i -= 1
+            j -= 1
+        elif d_cost < i_cost:
+            ops.append('v')
+            i -= 1
+        else:
+            ops.append('^')
+            j -= 1
+    ops.extend('v' * (i - r0))  # j reached 0: the rest of the walk goes straight up
+    return j
+
+def _walk(a, b, top, r0, r1, j, ops, insertion, deletion, substitution):
+    """_walk_block in O(m log n) memory: walk the bottom half first, then the top half from where it crossed."""
+    if r1 - r0 <= _LINEAR_BLOCK_ROWS or j == 0:
+        return _walk_block(a, b, top, r0, r1, j, ops, insertion, deletion, substitution)
+    mid = (r0 + r1) // 2
+    ramp = np.arange(j + 1) * insertion
+    row = top[:j + 1]
+    for x in a[r0:mid]:
+        row = _next_row(row, x, b[:j], ramp, deletion, substitution)
+    j = _walk(a, b, row, mid, r1, j, ops, insertion, deletion, substitution)
+    del row
+    return _walk(a, b, top, r0, mid, j, ops, insertion, deletion, substitution)
+
+def _linear_alignment(A, B, insertion, deletion, substitution):
+    """WagnerFischer(A, B) without the matrix (see WagnerFischer_linear)."""
+    try:
+        a, b = _encode(A, B)
+    except TypeError:  # unhashable elements
+        return WagnerFischer(A, B, insertion, deletion, substitution)
+    a, b = a.tolist(), np.asarray(b)
+    top = (np.arange(len(B) + 1) * insertion).astype(_cost_dtype(insertion, deletion, substitution))
+    ops = []
+    j = _walk(a, b, top, 0, len(A), len(B), ops, insertion, deletion, substitution)
+    ops.extend('^' * j)
+    ops.reverse()
+    return _alignment(ops, A, B)
+
+def _split(a, b, insertion, deletion, substitution):
+    """Hirschberg's split: a column j such that aligning a[:mid] with b[:j] and a[mid:] with b[j:] is optimal."""
+    mid = len(a) // 2
+    forward = _last_row(a[:mid], b, insertion, deletion, substitution)
+    backward = _last_row(a[mid:][::-1], b[::-1], insertion, deletion, substitution)[::-1]
+    return mid, int(np.argmin(forward + backward))
+
+def WagnerFischer_linear(A, B, insertion=1, deletion=1, substitution=1, parallel=False, max_workers=None):
+    """
+    WagnerFischer(A, B) keeping a few numpy rows rather than the (n + 1) x (m + 1) matrix,
+    for aligning long shelf runs (thousands of books against a catalog stretch as long).
+
+    The traceback is the same walk WagnerFischer makes, so the result (aligned_A,
+    aligned_B, changes) is identical for integer costs. Its tie-breaking reads only
+    costs from the top-left, so instead of Hirschberg's forward/backward split the rows
+    are split in half: the top half is filled (one numpy row at a time) up to the middle
+    row, the walk through the bottom half finds where it crosses that row, then the top
+    half is walked from there. Each recursion level keeps one row, O(m log n) in all,
+    and the time is O(n m log n).
+
+    With parallel=True, A is first cut into up to max_workers parts at Hirschberg split
+    points and the parts are aligned on a ProcessPoolExecutor. That alignment has the
+    same (optimal) cost but may break ties differently at the cuts.
+    """
+    if not parallel or len(A) < 2 * _LINEAR_BLOCK_ROWS:
+        return _linear_alignment(A, B, insertion, deletion, substitution)
+    try:
+        a, b = _encode(A, B)
+    except TypeError:
+        return _linear_alignment(A, B, insertion, deletion, substitution)
+
+    workers = max_workers or os.cpu_count() or 1
+    parts = [(0, len(A), 0, len(B))]  # (A start, A stop, B start, B stop)
+    while len(parts) < workers:
+        i0, i1, j0, j1 = max(parts, key=lambda p: p[1] - p[0])
+        if i1 - i0 < 2 * _LINEAR_BLOCK_ROWS:
+            break
+        mid, j = _split(a[i0:i1], b[j0:j1], insertion, deletion, substitution)
+        k = parts.index((i0, i1, j0, j1))
+        parts[k:k + 1] = [(i0, i0 + mid, j0, j0 + j), (i0 + mid, i1, j0 + j, j1)]
 
-    return aligned_A, aligned_B, ''.join(reversed(changes))
+    aligned_A, aligned_B, changes = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_linear_alignment, A[i0:i1], B[j0:j1], insertion, deletion, substitution)
+                   for i0, i1, j0, j1 in parts]
+        for future in futures:
+            part_A, part_B, part_changes = future.result()
+            aligned_A.extend(part_A)
+            aligned_B.extend(part_B)
+            changes.append(part_changes)
+    return aligned_A, aligned_B, ''.join(changes)
 
 book_database = [
     ["DT 515.9 .A17 B94 2021", "Byfield", "The Great Upheaval"],
@@ -117,4 +683,6 @@ book_database={"0": {"alt_title": "\u5e7f\u4e1c\u767e\u79d1\u5168\u66f8;", "call
 
 if __name__ == "__main__":
     print(WagnerFischer([1,2,3,4,5], [100,3,5]))
-    print(WagnerFischer([1,2,3,4,5,6], [1,2,4,3,100,5]))
\ No newline at end of file
+    print(WagnerFischer([1,2,3,4,5,6], [1,2,4,3,100,5]))
+    print(WagnerFischer_distance([1,2,3,4,5,6], [1,2,4,3,100,5]))
+    print(WagnerFischer_semiglobal([3,100,5], [1,2,3,4,5,6,7]))
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+
+def image_nbytes(image):
+    """Approximate memory held by a PIL image or NumPy array."""
+    if hasattr(image, "nbytes"):
+        return image.nbytes
+    return image.width * image.height * len(image.getbands())
+
+
+class FrameCache:
+    """
+    Least-recently-used cache of rendered frames, bounded by total bytes rather
+    than entry count (one 4K RGBA render weighs as much as dozens of thumbnails).
+
+    Keys are any hashable, typically (kind, image id, annotation params...). Values
+    are treated as immutable: callers must copy before drawing on a cached frame.
+    Safe to share between gradio's worker threads.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, sizeof=image_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            if size > self.max_bytes:  # would evict everything else and still not fit
+                return value
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return value
+
+    def get_or_render(self, key, render):
+        """The cached value for key, calling render() and caching its result on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, render())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
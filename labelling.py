@@ -0,0 +1,316 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from heapq import heappop, heappush
+
+log = logging.getLogger(__name__)
+
+# one row per answered fail
+LABEL_COLUMNS = (
+    "fail_idx",   # index of the fail in the memory being labelled
+    "image_id",   # photo it was seen in
+    "kind",       # "unsure" or "skipped"
+    "book_id",    # catalog id picked by the labeller (unsure), or the skipped book's id
+    "found",      # skipped only: 1 if the book is in the masked area, else 0
+    "click_x",    # skipped and found: click position in full-resolution pixels
+    "click_y",
+    "labeller",   # session that answered
+    "labelled_at",
+)
+
+
+class TraversalPlan:
+    """
+    Every labelling step as a flat list, built once from the image groups: for each image
+    (in img_keys order) its unsure fails, then each skipped sublist in turn. steps[n] is
+    (image index, mode "u"/"s", fail index) and image i's steps are steps[start[i]:start[i + 1]].
+
+    A session's position is a Cursor; moving forward, back, past an image or to step n
+    is index arithmetic on it. New images come from a WorkQueue, so concurrent sessions
+    still work on disjoint photos.
+    """
+
+    def __init__(self, img_keys, img_groups):
+        self.steps = []
+        self.start = [0]
+        for img_i, key in enumerate(img_keys):
+            group = img_groups[key]
+            self.steps.extend((img_i, "u", idx) for idx in group["unsure"])
+            self.steps.extend((img_i, "s", idx) for sublist in group["skipped"] for idx in sublist)
+            self.start.append(len(self.steps))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, n):
+        return self.steps[n]
+
+    def image_steps(self, img_i):
+        """range of the steps of image img_i."""
+        return range(self.start[img_i], self.start[img_i + 1])
+
+    def advance(self, cursor, work_queue, owner=None):
+        """
+        The cursor one step on. Past the last step of an image it continues with the next
+        image the session already has (after going back), or marks the image complete and
+        claims a new one; once the queue is empty it returns the end cursor (shown None).
+        If the session lost its last image (its tab closed or its lease ran out, see
+        WorkQueue) it leaves that image to whoever has it now and claims another.
+        """
+        shown, images, k = cursor
+        if images and k < len(images) and work_queue.lost(images[-1], owner):
+            images = images[:-1]
+            if k >= len(images):
+                shown, k = None, len(images) - 1
+        if shown is not None and shown + 1 in self.image_steps(images[k]):
+            return Cursor(shown + 1, images, k)
+        if k + 1 < len(images):
+            k += 1
+        else:
+            if 0 <= k < len(images):
+                work_queue.complete(images[k], owner)
+            img_i = work_queue.claim(owner)
+            if img_i is None:
+                return Cursor(None, images, len(images))
+            images, k = images + (img_i,), len(images)
+        return Cursor(self.start[images[k]], images, k)
+
+    def back(self, cursor):
+        """The cursor one step back, into the session's previous image if needed; unchanged at its first step."""
+        shown, images, k = cursor
+        if shown is not None and shown - 1 in self.image_steps(images[k]):
+            return Cursor(shown - 1, images, k)
+        if k > 0:
+            return Cursor(self.start[images[k - 1] + 1] - 1, images, k - 1)
+        return cursor
+
+    def skip_image(self, cursor, work_queue, owner=None):
+        """The cursor at the first step of the next image, leaving the rest of this one unanswered."""
+        shown, images, k = cursor
+        if shown is not None:
+            cursor = Cursor(self.start[images[k] + 1] - 1, images, k)
+        return self.advance(cursor, work_queue, owner)
+
+    def jump(self, cursor, n):
+        """The cursor at step n, or None if step n is on an image the session doesn't hold."""
+        img_i = self.steps[n][0]
+        if img_i not in cursor.images:
+            return None
+        return Cursor(n, cursor.images, cursor.images.index(img_i))
+
+    def upcoming(self, cursor, work_queue, n):
+        """The next n step indices advance() would move through, assuming the queue's next images."""
+        shown, images, k = cursor
+        ranges = [range(shown + 1, self.start[images[k] + 1])] if shown is not None else []
+        ranges += [self.image_steps(i) for i in images[k + 1:]]
+        ranges += [self.image_steps(i) for i in work_queue.peek(n)]
+        return [step for steps in ranges for step in steps][:n]
+
+
+# a labelling session's position: `shown` is the step on screen (None before the first and
+# after the last), `images` the images it claimed in order and images[k] the one shown;
+# k is -1 before the first image and len(images) at the end
+Cursor = namedtuple("Cursor", ["shown", "images", "k"])
+START = Cursor(None, (), -1)
+
+
+class WorkQueue:
+    """
+    Hands out image groups (indices into img_keys) to concurrent labelling sessions, in
+    order, each to exactly one session. Images listed in `done` are never handed out.
+
+    A session's uncompleted images go back to the queue when it is released (e.g. its
+    tab closed) or, with a `lease` in seconds, once it has neither claimed nor touched
+    anything for that long; released images are handed out again first.
+    """
+
+    def __init__(self, n_images, done=(), lease=None):
+        done = set(done)
+        self._todo = [i for i in range(n_images) if i not in done]
+        self._next = 0  # self._todo[:self._next] have been claimed
+        self._returned = []  # heap of released images, claimed before self._todo[self._next:]
+        self._owner = {}  # image -> session holding it
+        self._completed = done
+        self._completed_by = {}  # image -> session that completed it
+        self.lease = lease
+        self._last_seen = {}  # session -> time.monotonic() of its last claim or touch
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Images not yet claimed."""
+        return len(self._todo) - self._next + len(self._returned)
+
+    def claim(self, owner=None):
+        """The next unclaimed image, now held by owner, or None if every image is taken."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._last_seen[owner] = now
+            if self._returned:
+                image = heappop(self._returned)
+            elif self._next < len(self._todo):
+                image = self._todo[self._next]
+                self._next += 1
+            else:
+                return None
+            self._owner[image] = owner
+            return image
+
+    def peek(self, n):
+        """The next n images claim() would hand out, without claiming them (e.g. for prefetching)."""
+        with self._lock:
+            return (sorted(self._returned) + self._todo[self._next:self._next + n])[:n]
+
+    def touch(self, owner=None):
+        """Marks owner as active, renewing its lease."""
+        with self._lock:
+            if owner in self._last_seen:
+                self._last_seen[owner] = time.monotonic()
+
+    def release(self, owner=None):
+        """Puts the images owner holds back in the queue."""
+        with self._lock:
+            self._release(owner)
+
+    def _release(self, owner):
+        self._last_seen.pop(owner, None)
+        for image in [image for image, held_by in self._owner.items() if held_by == owner]:
+            del self._owner[image]
+            heappush(self._returned, image)
+
+    def _expire(self, now):
+        if self.lease is None:
+            return
+        for owner in [o for o, seen in self._last_seen.items() if now - seen > self.lease]:
+            self._release(owner)
+
+    def complete(self, image, owner=None):
+        with self._lock:
+            self._owner.pop(image, None)
+            self._completed.add(image)
+            self._completed_by[image] = owner
+
+    def lost(self, image, owner=None):
+        """Whether image, once claimed by owner, was released from it: it neither holds nor completed it."""
+        with self._lock:
+            if image in self._owner and self._owner[image] == owner:
+                return False
+            return not (image in self._completed_by and self._completed_by[image] == owner)
+
+    def progress(self):
+        """(completed, claimed but not completed, total) image counts."""
+        with self._lock:
+            return len(self._completed), len(self._owner), len(self._completed) + len(self._owner) + len(self)
+
+
+class LabelWriter:
+    """
+    Collects labels from any thread and writes them to an SQLite `labels` table in batches
+    from a single background thread, so labellers never wait on the database.
+
+    A batch is written once batch_size labels are waiting or flush_interval seconds have
+    passed. on_batch(labels), if given, is called on the writer thread after each batch
+    is committed, e.g. to mirror the labels into a BookMemory. flush() blocks until
+    everything written so far is committed.
+    """
+
+    def __init__(self, filepath, batch_size=64, flush_interval=1.0, on_batch=None):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_batch = on_batch
+        self.written = 0
+        self._queue = queue.Queue()
+        _create_table(filepath)
+        self._thread = threading.Thread(target=self._run, name="label-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, **label):
+        label.setdefault("labelled_at", time.time())
+        self._queue.put(label)
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        con = sqlite3.connect(self.filepath)
+        placeholders = ", ".join("?" * len(LABEL_COLUMNS))
+        insert = f"INSERT INTO labels ({', '.join(LABEL_COLUMNS)}) VALUES ({placeholders})"
+        try:
+            closing = False
+            while not closing:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    try:
+                        batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is None
+                labels = [label for label in batch if label is not None]
+                try:
+                    if labels:
+                        self._write_batch(con, insert, labels)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            con.close()
+
+    def _write_batch(self, con, insert, labels):
+        # errors are logged to keep the writer alive; a failed batch is reported, not retried
+        try:
+            con.executemany(insert, [tuple(label.get(c) for c in LABEL_COLUMNS) for label in labels])
+            con.commit()
+        except Exception as e:
+            log.error("LabelWriter: failed to write %d labels: %r", len(labels), e)
+            return
+        self.written += len(labels)
+        if self.on_batch is not None:
+            try:
+                self.on_batch(labels)
+            except Exception as e:  # the labels are committed; only the callback's copy is missing
+                log.error("LabelWriter: on_batch failed for %d written labels: %r", len(labels), e)
+
+
+def _create_table(filepath):
+    con = sqlite3.connect(filepath)
+    try:
+        columns = ", ".join(LABEL_COLUMNS)
+        con.execute(f"CREATE TABLE IF NOT EXISTS labels (id INTEGER PRIMARY KEY, {columns})")
+        con.commit()
+    finally:
+        con.close()
+
+
+def read_labels(filepath):
+    """Every label in an SQLite file written by LabelWriter, as dicts in the order written."""
+    _create_table(filepath)
+    con = sqlite3.connect(filepath)
+    try:
+        con.row_factory = sqlite3.Row
+        return [dict(row) for row in con.execute("SELECT * FROM labels ORDER BY id")]
+    finally:
+        con.close()
+
+
+def label_image_id(memory, idx):
+    """The image_id a label of fail idx records: the id of the photo it was seen in, or ("book", idx) without one."""
+    img_info = memory.book_img_info[idx] if idx < len(memory.book_img_info) else {}
+    return str(img_info.get("image_id", ("book", idx)))
+
+
+def labelled_fails(labels, memory):
+    """
+    Indices of the fails of memory that have a label. Labels are matched on fail_idx and
+    image_id both, so labels written for another memory in the same file don't count.
+    """
+    return {label["fail_idx"] for label in labels
+            if 0 <= label["fail_idx"] < len(memory) and label["image_id"] == label_image_id(memory, label["fail_idx"])}
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Latencies of the last `window` events, in seconds, with nearest-rank percentiles."""
+
+    def __init__(self, window=2048):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """The p-th percentile (0-100, nearest rank) of the recorded latencies, or None if empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, round(p / 100 * len(samples) + 0.5) - 1))
+        return samples[rank]
+
+
+class Span:
+    """
+    Durations of one named operation: a running count, sum and bucket counts since start
+    (what a Prometheus histogram wants) plus the last `window` samples for percentiles.
+    """
+
+    BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # bucket upper bounds, seconds
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.sum = 0.0
+        self.bucket_counts = [0] * (len(self.BOUNDS) + 1)  # per bucket, not cumulative
+        self.recent = LatencyHistogram(window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            self.bucket_counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.recent.record(seconds)
+
+
+class Counter:
+    """A running total, with the increments of the last `window` seconds kept for a per-minute rate."""
+
+    def __init__(self, window=60.0):
+        self.value = 0
+        self.window = window
+        self._recent = deque()  # [whole monotonic second, n], one entry per second with increments
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        second = int(time.monotonic())
+        with self._lock:
+            self.value += n
+            if self._recent and self._recent[-1][0] == second:
+                self._recent[-1][1] += n
+            else:
+                self._recent.append([second, n])
+                self._expire(second)
+
+    def _expire(self, now):
+        while self._recent and self._recent[0][0] <= now - self.window:
+            self._recent.popleft()
+
+    def per_minute(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            n = sum(n for _, n in self._recent)
+        return n * 60.0 / self.window
+
+
+class Metrics:
+    """
+    Timing spans and counters for the hot paths, cheap enough to leave on in production.
+
+        with metrics.span("annotate"):
+            ...
+        metrics.inc("labels")
+
+    Collectors (functions returning {name: value}, e.g. a cache's hit counts) are polled
+    at export time. prometheus_text() and json_lines() render a snapshot; export() writes
+    one to a file, and start_export() does so every few seconds on a daemon thread.
+    Names get `prefix` in the Prometheus output; spans are histograms in seconds.
+    """
+
+    def __init__(self, prefix="book_matcher", window=2048):
+        self.prefix = prefix
+        self.window = window
+        self.spans = {}     # name -> Span
+        self.counters = {}  # name -> Counter
+        self._collectors = []  # (function, "counter" or "gauge")
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def _get(self, table, name, make):
+        item = table.get(name)
+        if item is None:
+            with self._lock:
+                item = table.setdefault(name, make())
+        return item
+
+    def span(self, name):
+        """Context manager recording the duration of its block under name."""
+        return _SpanTimer(self._get(self.spans, name, lambda: Span(self.window)))
+
+    def observe(self, name, seconds):
+        self._get(self.spans, name, lambda: Span(self.window)).record(seconds)
+
+    def inc(self, name, n=1):
+        self._get(self.counters, name, Counter).inc(n)
+
+    def register(self, collector, kind="gauge"):
+        """Adds a function returning {name: value}, read at export time as counters or gauges."""
+        with self._lock:
+            self._collectors.append((collector, kind))
+
+    def reset(self):
+        """Drops every span and counter recorded so far (collectors stay registered)."""
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+
+    def _snapshot(self):
+        """(counters, spans, collectors) as sorted lists, copied under the lock (callbacks may add names meanwhile)."""
+        with self._lock:
+            return sorted(self.counters.items()), sorted(self.spans.items()), list(self._collectors)
+
+    def _collected(self, collectors):
+        for collector, kind in collectors:
+            for name, value in collector().items():
+                if isinstance(value, (int, float)):
+                    yield name, kind, value
+
+    def prometheus_text(self):
+        """A snapshot in the Prometheus text exposition format."""
+        counters, spans, collectors = self._snapshot()
+        lines = []
+        for name, counter in counters:
+            metric = f"{self.prefix}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {counter.value}"]
+            metric = f"{self.prefix}_{name}_per_minute"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {counter.per_minute():g}"]
+        for name, span in spans:
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            with span._lock:
+                count, total, buckets = span.count, span.sum, list(span.bucket_counts)
+            cumulative = 0
+            for bound, n in zip(span.BOUNDS + (float("inf"),), buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines += [f"{metric}_sum {total:.6f}", f"{metric}_count {count}"]
+        for name, kind, value in self._collected(collectors):
+            metric = f"{self.prefix}_{name}" + ("_total" if kind == "counter" else "")
+            lines += [f"# TYPE {metric} {kind}", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def json_lines(self):
+        """A snapshot as JSON lines, one object per metric, all with the same timestamp."""
+        ts = round(time.time(), 3)
+        counters, spans, collectors = self._snapshot()
+        records = []
+        for name, counter in counters:
+            records.append({"ts": ts, "metric": name, "type": "counter", "value": counter.value,
+                            "per_minute": counter.per_minute()})
+        for name, span in spans:
+            records.append({"ts": ts, "metric": name, "type": "span", "count": span.count, "sum_s": span.sum,
+                            "p50_s": span.recent.percentile(50), "p95_s": span.recent.percentile(95),
+                            "p99_s": span.recent.percentile(99)})
+        for name, kind, value in self._collected(collectors):
+            records.append({"ts": ts, "metric": name, "type": kind, "value": value})
+        return "".join(json.dumps(record) + "\n" for record in records)
+
+    def export(self, filepath):
+        """
+        Writes a snapshot to filepath: a .prom file is replaced with the Prometheus text (as
+        node_exporter's textfile collector expects), anything else gets JSON lines appended.
+        """
+        if filepath.endswith(".prom"):
+            tmp = filepath + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, filepath)
+        else:
+            with open(filepath, "a") as f:
+                f.write(self.json_lines())
+
+    def start_export(self, filepath, interval=15.0):
+        """Calls export(filepath) every interval seconds on a daemon thread, until stop_export()."""
+        self.stop_export()
+        stop = threading.Event()
+
+        def loop():
+            stopped = False
+            while not stopped:
+                stopped = stop.wait(interval)  # a last snapshot once stopped
+                try:
+                    self.export(filepath)
+                except Exception:  # keep exporting; a bad snapshot shouldn't end the thread
+                    log.exception("could not export metrics to %s", filepath)
+
+        thread = threading.Thread(target=loop, name="metrics-export", daemon=True)
+        self._exporter = (stop, thread)
+        thread.start()
+
+    def stop_export(self):
+        if self._exporter is not None:
+            stop, thread = self._exporter
+            stop.set()
+            thread.join()
+            self._exporter = None
+
+
+class _SpanTimer:
+    __slots__ = ("span", "start")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.span.record(time.perf_counter() - self.start)
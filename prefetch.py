@@ -0,0 +1,67 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Renders upcoming entries on a thread pool so they are ready before they are asked for.
+
+    schedule(keys, owner) is given the next few entry keys in order; it starts
+    render(key) for any not already in flight and cancels work for keys that dropped
+    out of the window. Each owner (e.g. a labelling session) has its own window.
+    take(key) hands over the finished (or still running) render, or returns
+    `missing` if the key was never scheduled, so the caller can render it inline.
+    """
+
+    def __init__(self, render, max_workers=2):
+        self.render = render
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = {}  # key -> Future
+        self._windows = {}  # owner -> keys it last scheduled
+        self._lock = threading.Lock()
+
+    def schedule(self, keys, owner=None):
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            self._windows[owner] = set(keys)
+            self._cancel_unwanted()
+            for key in keys:
+                if key not in self._pending:
+                    self._pending[key] = self._pool.submit(self.render, key)
+
+    def take(self, key, missing=None):
+        with self._lock:
+            future = self._pending.pop(key, None)
+        if future is None or future.cancelled():
+            return missing
+        try:
+            return future.result()
+        except Exception as e:  # render it again inline, where the error reaches the caller
+            log.warning("prefetch of %r failed: %r", key, e)
+            return missing
+
+    def _cancel_unwanted(self):
+        wanted = set().union(*self._windows.values())
+        for key in [k for k in self._pending if k not in wanted]:
+            self._pending.pop(key).cancel()
+
+    def forget(self, owner):
+        """Drop an owner's window (e.g. a session that ended), cancelling the keys no other owner wants."""
+        with self._lock:
+            if self._windows.pop(owner, None) is not None:
+                self._cancel_unwanted()
+
+    def clear(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._windows.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._pool.shutdown(wait=False)
+
@@ -0,0 +1,45 @@
+class Pyramid:
+    """
+    Halved copies of a photo (cv2.resize with INTER_AREA), for rendering previews
+    at roughly display size instead of full camera resolution.
+
+    levels[0] is the original array (not copied); each further level halves both
+    sides, down to the first level no smaller than min_height. Levels keep the
+    original channel order.
+    """
+
+    def __init__(self, image, min_height=300):
+        import cv2  # only the labelling UI needs previews
+        self.levels = [image]
+        while self.levels[-1].shape[0] // 2 >= min_height:
+            prev = self.levels[-1]
+            h, w = prev.shape[:2]
+            self.levels.append(cv2.resize(prev, (w // 2, h // 2), interpolation=cv2.INTER_AREA))
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels[1:])  # levels[0] belongs to the caller
+
+    @property
+    def full_size(self):
+        """(width, height) of the original."""
+        h, w = self.levels[0].shape[:2]
+        return w, h
+
+    def level_for(self, height):
+        """(level array, scale): the smallest level at least `height` pixels tall, scale = level width / full width."""
+        level = self.levels[0]
+        for candidate in self.levels[1:]:
+            if candidate.shape[0] < height:
+                break
+            level = candidate
+        return level, level.shape[1] / self.levels[0].shape[1]
+
+
+def to_full_resolution(point, preview_size, full_size):
+    """
+    Map an (x, y) pixel in a preview of preview_size (w, h) to the full_size (w, h)
+    original: the centre of the preview pixel goes to the centre of the area it covers.
+    """
+    (x, y), (pw, ph), (fw, fh) = point, preview_size, full_size
+    return (x + 0.5) * fw / pw - 0.5, (y + 0.5) * fh / ph - 0.5
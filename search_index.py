@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import re
+
+import numpy as np
+
+from database import WagnerFischer_distance
+
+log = logging.getLogger(__name__)
+
+FIELDS = ("call_number", "alt_title")
+FORMAT_VERSION = 1
+
+# runs of CJK ideographs, kana and hangul; those are indexed by bigrams, everything else by trigrams
+_CJK = re.compile("([぀-ヿ㐀-鿿가-힯豈-﫿\U00020000-\U0002ffff]+)")
+
+
+def fold(text):
+    """Case- and whitespace-insensitive form of a call number or title, as indexed and compared."""
+    return "".join(str(text).split()).casefold()
+
+
+def ngrams(folded):
+    """
+    The distinct n-grams of a folded string: character bigrams inside CJK runs (a lone
+    ideograph is its own gram), trigrams elsewhere, with \\x02/\\x03 marking the ends of
+    each non-CJK run so that short call numbers still have grams.
+    """
+    grams = set()
+    for i, run in enumerate(_CJK.split(folded)):
+        if not run:
+            continue
+        if i % 2:  # CJK
+            grams.update(run[j:j + 2] for j in range(max(len(run) - 1, 1)))
+        else:
+            run = "\x02" + run + "\x03"
+            grams.update(run[j:j + 3] for j in range(len(run) - 2))
+    return grams
+
+
+def catalog_fingerprint(catalog):
+    """Hash of the indexed fields of every record, to tell whether a saved index is stale."""
+    h = hashlib.blake2b(digest_size=16)
+    for db_id in sorted(catalog):
+        rec = catalog[db_id]
+        h.update(repr((int(db_id), *(rec.get(field) or "" for field in FIELDS))).encode("utf-8"))
+    return h.hexdigest()
+
+
+class NgramIndex:
+    """
+    Inverted n-gram index over the call_number and alt_title of a catalog, for fuzzy lookup
+    of what a labeller typed or what OCR read off a spine.
+
+    A query is split into the same grams; the documents (one per record and field) sharing
+    the most grams with it are then verified with the bounded WagnerFischer_distance on the
+    folded strings, and the closest k records are returned. Posting lists are stored as one
+    CSR array pair (offsets, documents), so the index saves to and loads from a single .npz.
+    """
+
+    def __init__(self, vocab, offsets, postings, doc_ids, doc_fields, texts, fingerprint=None):
+        self.vocab = vocab  # gram -> row in offsets
+        self.offsets = offsets  # postings[offsets[g]:offsets[g + 1]] are the documents containing gram g
+        self.postings = postings
+        self.doc_ids = doc_ids  # document -> database id
+        self.doc_fields = doc_fields  # document -> index into FIELDS
+        self.texts = texts  # document -> folded text
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def build(cls, catalog):
+        vocab = {}
+        doc_ids, doc_fields, texts = [], [], []
+        gram_rows, gram_docs = [], []
+        for db_id, rec in catalog.items():
+            for f, field in enumerate(FIELDS):
+                text = fold(rec.get(field) or "")
+                if not text:
+                    continue
+                doc = len(texts)
+                doc_ids.append(int(db_id))
+                doc_fields.append(f)
+                texts.append(text)
+                grams = ngrams(text)
+                gram_rows.extend(vocab.setdefault(g, len(vocab)) for g in grams)
+                gram_docs.extend([doc] * len(grams))
+
+        gram_rows = np.asarray(gram_rows, dtype=np.int64)
+        order = np.argsort(gram_rows, kind="stable")  # documents stay sorted within each posting list
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_rows, minlength=len(vocab)), out=offsets[1:])
+        return cls(
+            vocab, offsets, np.asarray(gram_docs, dtype=np.int32)[order],
+            np.asarray(doc_ids, dtype=np.int64), np.asarray(doc_fields, dtype=np.int8), texts,
+            fingerprint=catalog_fingerprint(catalog),
+        )
+
+    def save(self, filepath):
+        grams = sorted(self.vocab, key=self.vocab.get)
+        with open(filepath, "wb") as f:  # np.savez would append .npz to a bare path
+            np.savez(
+                f,
+                format_version=np.array(FORMAT_VERSION),
+                fingerprint=np.array(self.fingerprint or ""),
+                grams=np.array(grams, dtype=str),
+                offsets=self.offsets,
+                postings=self.postings,
+                doc_ids=self.doc_ids,
+                doc_fields=self.doc_fields,
+                texts=np.array(self.texts, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as data:
+            version = int(data["format_version"])
+            if version > FORMAT_VERSION:
+                raise ValueError(f"{filepath}: search index format {version} is newer than this code ({FORMAT_VERSION})")
+            grams = data["grams"].tolist()
+            return cls(
+                {g: i for i, g in enumerate(grams)}, data["offsets"], data["postings"],
+                data["doc_ids"], data["doc_fields"], data["texts"].tolist(),
+                fingerprint=str(data["fingerprint"]) or None,
+            )
+
+    @classmethod
+    def load_or_build(cls, filepath, catalog):
+        """The index saved at filepath if it was built from this catalog, else a fresh one (saved there)."""
+        fingerprint = catalog_fingerprint(catalog)
+        if os.path.exists(filepath):
+            try:
+                index = cls.load(filepath)
+            except (OSError, ValueError, KeyError) as e:
+                log.info("rebuilding search index, could not load %s: %s", filepath, e)
+            else:
+                if index.fingerprint == fingerprint:
+                    return index
+        index = cls.build(catalog)
+        try:
+            index.save(filepath)
+        except OSError as e:  # e.g. a read-only catalog directory: the index still works, it is just rebuilt next time
+            log.warning("could not save search index to %s: %s", filepath, e)
+        return index
+
+    def candidates(self, folded, limit):
+        """Up to `limit` documents sharing the most grams with a folded query, best first, with their counts."""
+        rows = [self.vocab[g] for g in ngrams(folded) if g in self.vocab]
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        hits = np.concatenate([self.postings[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+        docs, counts = np.unique(hits, return_counts=True)
+        if len(docs) > limit:
+            top = np.argpartition(-counts, limit - 1)[:limit]
+            docs, counts = docs[top], counts[top]
+        order = np.argsort(-counts, kind="stable")
+        return docs[order], counts[order]
+
+    def search(self, query, k=10, max_cost=None, candidates=None, prefix=False):
+        """
+        Up to k (database id, field, distance) for the records closest to query, nearest first.
+
+        Distances are edit distances between the folded query and the folded field; records
+        further than max_cost (default: a third of the query length, at least 2) are left out. `candidates`
+        bounds how many gram matches are verified (default max(20 * k, 200)). With prefix=True
+        a field also matches if its first len(query) characters are close, for text still being typed.
+        """
+        q = fold(query)
+        if not q:
+            return []
+        if max_cost is None:
+            max_cost = max(2, len(q) // 3)
+        docs, counts = self.candidates(q, candidates or max(20 * k, 200))
+
+        best = {}  # database id -> (distance, -shared grams, field)
+        for doc, count in zip(docs.tolist(), counts.tolist()):
+            text = self.texts[doc]
+            distance = WagnerFischer_distance(q, text, max_cost=max_cost)
+            if prefix and len(text) > len(q):
+                head = WagnerFischer_distance(q, text[:len(q)], max_cost=max_cost)
+                if head is not None and (distance is None or head < distance):
+                    distance = head
+            if distance is None:
+                continue
+            db_id = int(self.doc_ids[doc])
+            score = (distance, -count, FIELDS[self.doc_fields[doc]])
+            if db_id not in best or score < best[db_id]:
+                best[db_id] = score
+        ranked = sorted(best.items(), key=lambda item: item[1])[:k]
+        return [(db_id, field, distance) for db_id, (distance, _, field) in ranked]
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from book_memory import BookMemory, load_from_dir, save_to_dir
+
+
+def _photo(seed):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, (4, 6, 3), dtype=np.uint8), rng.random((4, 6))]
+
+
+def _check_bgr_depth(bm):
+    first, second = _photo(0), _photo(1)
+    stored = len(bm.images)
+    a = bm.add_book(np.array([0.0, 0.0, 1.0]), {"id": [None, 1, 2]}, {"image": first})
+    b = bm.add_book(np.array([0.1, 0.0, 1.0]), {"id": [None, 3, 4]}, {"image": [first[0].copy(), first[1]]})
+    assert bm.book_img_info[a]["image_id"] == bm.book_img_info[b]["image_id"]
+    bgr, depth = bm.get_image(a)
+    assert np.array_equal(bgr, first[0]) and np.array_equal(depth, first[1])
+    assert len(bm.images) == stored + 2
+
+    # both fails move to another photo: the first one's arrays are released
+    bm.add_book(np.array([0.0, 0.0, 1.0]), {"id": [None, 1, 2]}, {"image": second})
+    assert len(bm.images) == stored + 4
+    bm.add_book(np.array([0.1, 0.0, 1.0]), {"id": [None, 3, 4]}, {"image": list(second)})
+    assert len(bm.images) == stored + 2
+    bgr, depth = bm.get_image(b)
+    assert np.array_equal(bgr, second[0]) and np.array_equal(depth, second[1])
+
+
+def test_bgr_depth_images():
+    _check_bgr_depth(BookMemory(database=None))
+
+
+def test_bgr_depth_images_after_round_trip(tmp_path):
+    bm = BookMemory(database=None)
+    bm.add_book(np.array([0.5, 0.0, 1.0]), {"id": [None, 5, 6]}, {"image": _photo(2)})
+    save_to_dir(bm, tmp_path / "memory")
+    loaded = load_from_dir(tmp_path / "memory")
+    assert np.array_equal(loaded.get_image(0)[1], bm.get_image(0)[1])
+    _check_bgr_depth(loaded)
+
+
+def test_save_over_own_directory(tmp_path):
+    bm = BookMemory(database=None)
+    for seed in range(3):
+        bm.add_book(np.array([seed, 0.0, 1.0]), {"id": [None, seed]}, {"image": _photo(seed)})
+    path = tmp_path / "memory"
+    save_to_dir(bm, path)
+    loaded = load_from_dir(path)  # its images are views into path/images.bin
+    save_to_dir(loaded, path)
+    assert np.array_equal(loaded.get_image(2)[0], bm.get_image(2)[0])
+    again = load_from_dir(path)
+    assert sorted(os.listdir(path)) == ["images.bin", "meta.json", "positions.npy"]
+    for idx in range(3):
+        for saved, original in zip(again.get_image(idx), bm.get_image(idx)):
+            assert np.array_equal(saved, original)
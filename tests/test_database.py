@@ -0,0 +1,119 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import WagnerFischer, WagnerFischer_distance, WagnerFischer_linear
+
+COSTS = [(1, 1, 1), (1, 3, 4), (2, 1, 2), (3, 2, 1), (0.5, 1.5, 1.25)]
+
+
+def reference_matrix(A, B, insertion, deletion, substitution):
+    """The textbook (n + 1) x (m + 1) matrix, as the original WagnerFischer filled it."""
+    D = [[0] * (len(B) + 1) for _ in range(len(A) + 1)]
+    for i in range(1, len(A) + 1):
+        D[i][0] = D[i - 1][0] + deletion
+    for j in range(1, len(B) + 1):
+        D[0][j] = D[0][j - 1] + insertion
+    for i in range(1, len(A) + 1):
+        for j in range(1, len(B) + 1):
+            if A[i - 1] == B[j - 1]:
+                D[i][j] = D[i - 1][j - 1]
+            else:
+                D[i][j] = min(D[i][j - 1] + insertion, D[i - 1][j] + deletion, D[i - 1][j - 1] + substitution)
+    return D
+
+
+def reference_cost(A, B, insertion, deletion, substitution):
+    return reference_matrix(A, B, insertion, deletion, substitution)[len(A)][len(B)]
+
+
+def reference_alignment(A, B, insertion, deletion, substitution):
+    """The original WagnerFischer: the full matrix and its list-insert traceback."""
+    D = reference_matrix(A, B, insertion, deletion, substitution)
+    aligned_A, aligned_B, changes = list(A), list(B), []
+    i, j = len(A), len(B)
+    while i > 0 and j > 0:
+        s_cost, d_cost, i_cost = D[i][j], D[i - 1][j], D[i][j - 1]
+        if s_cost <= d_cost and s_cost <= i_cost:
+            changes.append("=" if A[i - 1] == B[j - 1] else "*")
+            i -= 1
+            j -= 1
+        elif d_cost < i_cost:
+            changes.append("v")
+            aligned_B.insert(j, "*")
+            i -= 1
+        else:
+            changes.append("^")
+            aligned_A.insert(i, "*")
+            j -= 1
+    for _ in range(i):
+        changes.append("v")
+        aligned_B.insert(0, "*")
+    for _ in range(j):
+        changes.append("^")
+        aligned_A.insert(0, "*")
+    return aligned_A, aligned_B, "".join(reversed(changes))
+
+
+def alignment_cost(result, A, B, insertion, deletion, substitution):
+    """The cost of an alignment's changes, checking it really aligns A with B."""
+    aligned_A, aligned_B, changes = result
+    assert [x for x, op in zip(aligned_A, changes) if op != "^"] == list(A)
+    assert [y for y, op in zip(aligned_B, changes) if op != "v"] == list(B)
+    for x, y, op in zip(aligned_A, aligned_B, changes):
+        assert (op == "=") == (op in "=*" and x == y)
+    return sum({"=": 0, "*": substitution, "v": deletion, "^": insertion}[op] for op in changes)
+
+
+def shelf_pair(rng, n_max):
+    """A and B drawn from a small alphabet, so matches, gaps and ties are all common."""
+    alphabet = rng.randrange(2, 8)
+    A = [rng.randrange(alphabet) for _ in range(rng.randrange(n_max + 1))]
+    B = [rng.randrange(alphabet) for _ in range(rng.randrange(n_max + 1))]
+    return A, B
+
+
+@pytest.mark.parametrize("costs", COSTS)
+def test_against_reference(costs):
+    rng = random.Random(sum(costs))
+    for _ in range(150):
+        A, B = shelf_pair(rng, 40)  # up to 1600 cells: both the pure-python and the numpy fill
+        expected = reference_alignment(A, B, *costs)
+        result = WagnerFischer(A, B, *costs)
+        assert result == expected
+        assert WagnerFischer(A, B, *costs, k=rng.randrange(1, 6)) == expected
+        assert WagnerFischer_distance(A, B, *costs, bit_parallel=False) == pytest.approx(reference_cost(A, B, *costs))
+        if all(isinstance(c, int) for c in costs):
+            assert WagnerFischer_linear(A, B, *costs) == expected
+        if costs == (1, 1, 1):
+            assert alignment_cost(result, A, B, *costs) == reference_cost(A, B, *costs)
+
+
+def test_distance_bit_parallel_and_max_cost():
+    rng = random.Random(1)
+    for _ in range(300):
+        A, B = shelf_pair(rng, 90)  # past 64 elements: more than one machine word
+        expected = reference_cost(A, B, 1, 1, 1)
+        assert WagnerFischer_distance(A, B, bit_parallel=True) == expected
+        limit = rng.randrange(expected + 3)
+        within = WagnerFischer_distance(A, B, max_cost=limit)
+        assert within == (expected if expected <= limit else None)
+        within = WagnerFischer_distance(A, B, 1, 3, 4, max_cost=limit, bit_parallel=False)
+        cost = reference_cost(A, B, 1, 3, 4)
+        assert within == (cost if cost <= limit else None)
+
+
+@pytest.mark.parametrize("costs", [(1, 1, 1), (1, 3, 4)])
+def test_linear_parallel_cost(costs):
+    rng = random.Random(2)
+    for _ in range(3):
+        n = rng.randrange(300, 400)
+        A = [rng.randrange(20) for _ in range(n)]
+        B = [x for x in A if rng.random() > 0.1] + [rng.randrange(20) for _ in range(20)]
+        rng.shuffle(B[:40])
+        result = WagnerFischer_linear(A, B, *costs, parallel=True, max_workers=3)
+        assert alignment_cost(result, A, B, *costs) == reference_cost(A, B, *costs)
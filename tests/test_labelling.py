@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from labelling import START, TraversalPlan, WorkQueue
+
+
+def _plan(n_images, per_image=2):
+    groups = {key: {"unsure": [key * per_image + i for i in range(per_image)], "skipped": []}
+              for key in range(n_images)}
+    return TraversalPlan(list(groups), groups)
+
+
+def _walk_to_end(plan, queue, owner):
+    cursor, shown = plan.advance(START, queue, owner), []
+    while cursor.shown is not None:
+        shown.append(cursor.shown)
+        cursor = plan.advance(cursor, queue, owner)
+    return cursor, shown
+
+
+def test_back_then_next_at_the_end():
+    plan, queue = _plan(2), WorkQueue(2)
+    end, shown = _walk_to_end(plan, queue, "a")
+    assert shown == list(range(len(plan)))
+
+    last = plan.back(end)
+    assert last.shown == len(plan) - 1
+    before_last = plan.back(last)
+    assert plan.advance(before_last, queue, "a") == last
+    assert plan.advance(last, queue, "a").shown is None
+
+
+def test_released_image_goes_to_another_session():
+    plan, queue = _plan(3), WorkQueue(3)
+    a = plan.advance(START, queue, "a")
+    queue.release("a")
+    b = plan.advance(START, queue, "b")
+    assert plan[b.shown][0] == plan[a.shown][0]
+    # a comes back: it leaves its image to b and claims the next one
+    a = plan.advance(a, queue, "a")
+    assert plan[a.shown][0] not in b.images